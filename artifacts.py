@@ -0,0 +1,167 @@
+import argparse
+import os
+import pickle
+import tempfile
+import time
+from types import MappingProxyType
+
+from data_preparation import (get_emo_dict, get_dialogues, get_menu, get_intent_dataset, get_intent_examples,
+                              get_files_hash)
+from dialogue_index import DialogueIndex
+from menu_index import MenuIndex
+from intent_classifier import IntentClassifier, CompactIntentClassifier, train_and_save_model
+from nlp_functions import normalize_text, set_menu_index, MODEL_LOAD_TIMINGS
+
+from config import (ARTIFACTS_FILE_PATH, DIALOGUES_FILE_PATH, EMO_DICT_FILE_PATH, INTENT_DATASET_FILE_PATH,
+                    MENU_FILE_PATH, MODEL_FILE_PATH, COMPACT_MODEL_DIR_PATH, INTENT_MODEL_FORMAT,
+                    LEMMATIZATION_FAST_MODE, SPELL_MAX_EDIT_DISTANCE, SPELL_GENERAL_FALLBACK)
+
+# Версия формата кэша: увеличивается при изменении состава артефактов или способа их построения
+ARTIFACTS_VERSION = 3
+
+# Настройки нормализации текста, от которых зависят нормализованные диалоги и примеры намерений в кэше
+NORMALIZATION_SETTINGS = {
+    "lemmatization_fast_mode": LEMMATIZATION_FAST_MODE,
+    "spell_max_edit_distance": SPELL_MAX_EDIT_DISTANCE,
+    "spell_general_fallback": SPELL_GENERAL_FALLBACK
+}
+
+# Время этапов запуска в секундах
+STARTUP_TIMINGS = {}
+
+
+def _timed(name, function, *args):
+    """Выполнение этапа запуска с замером его времени"""
+    start = time.perf_counter()
+    result = function(*args)
+    STARTUP_TIMINGS[name] = time.perf_counter() - start
+    return result
+
+
+def get_intent_classifier():
+    """Загрузка модели классификатора или обучение новой при ее отсутствии"""
+    try:
+        return IntentClassifier.load(MODEL_FILE_PATH)
+    except FileNotFoundError:
+        print("Model not found, training new one...")
+        return train_and_save_model(INTENT_DATASET_FILE_PATH, MODEL_FILE_PATH)
+
+
+def get_compact_intent_classifier():
+    """Загрузка компактной модели классификатора с повторным экспортом, если она старше исходной модели"""
+    classes_file_path = os.path.join(COMPACT_MODEL_DIR_PATH, "classes.npy")
+    if (not os.path.exists(classes_file_path)
+            or os.path.getmtime(classes_file_path) < os.path.getmtime(MODEL_FILE_PATH)):
+        get_intent_classifier().export_compact(COMPACT_MODEL_DIR_PATH)
+    return CompactIntentClassifier.load(COMPACT_MODEL_DIR_PATH)
+
+
+def get_sources_hash():
+    """Хэш всех исходных файлов, из которых строятся артефакты"""
+    return get_files_hash(DIALOGUES_FILE_PATH, EMO_DICT_FILE_PATH, INTENT_DATASET_FILE_PATH, MENU_FILE_PATH,
+                          MODEL_FILE_PATH)
+
+
+def build_artifacts(sources_hash):
+    """Построение всех производных данных: словаря тональности, диалогов, намерений, индекса меню и модели"""
+    menu = _timed("build_menu", get_menu, MENU_FILE_PATH)
+    intent_dataset = _timed("build_intent_dataset", get_intent_dataset, INTENT_DATASET_FILE_PATH, menu)
+
+    return {
+        "version": ARTIFACTS_VERSION,
+        "sources_hash": sources_hash,
+        "intent_model_format": INTENT_MODEL_FORMAT,
+        "normalization_settings": NORMALIZATION_SETTINGS,
+        "emo_dict": _timed("build_emo_dict", get_emo_dict, EMO_DICT_FILE_PATH),
+        "dialogue_index": _timed("build_dialogue_index", lambda: DialogueIndex(get_dialogues(DIALOGUES_FILE_PATH))),
+        "menu": menu,
+        "intent_dataset": intent_dataset,
+        "intent_examples": _timed("build_intent_examples", get_intent_examples, intent_dataset),
+        "menu_index": _timed("build_menu_index", MenuIndex, MENU_FILE_PATH, normalize_text),
+        # Компактная модель отображается в память отдельно и в кэш не попадает
+        "intent_classifier": (_timed("load_intent_classifier", get_intent_classifier)
+                              if INTENT_MODEL_FORMAT == "sklearn" else None)
+    }
+
+
+def save_artifacts(artifacts, file_path):
+    """Атомарная запись артефактов в файл кэша"""
+    dir_path = os.path.dirname(file_path)
+    os.makedirs(dir_path, exist_ok=True)
+    # Временный файл уникален для каждой записи: процессы шардов могут пересобирать кэш одновременно
+    file_descriptor, temp_file_path = tempfile.mkstemp(dir=dir_path, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            pickle.dump(artifacts, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file_path, file_path)
+    finally:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+
+def read_artifacts(file_path):
+    """Чтение файла кэша одним вызовом pickle.load (все объекты кэша создаются заново в памяти процесса)"""
+    with open(file_path, "rb") as file:
+        return pickle.load(file)
+
+
+def load_artifacts(file_path=ARTIFACTS_FILE_PATH):
+    """Загрузка артефактов из кэша с пересборкой при изменении исходных файлов, настроек нормализации или формата"""
+    start = time.perf_counter()
+
+    # Модель должна существовать до расчета хэша, так как ее файл входит в число исходных
+    if not os.path.exists(MODEL_FILE_PATH):
+        _timed("train_intent_classifier", get_intent_classifier)
+
+    sources_hash = _timed("hash_sources", get_sources_hash)
+
+    try:
+        artifacts = _timed("read_artifacts", read_artifacts, file_path)
+        if (artifacts.get("version") != ARTIFACTS_VERSION or artifacts.get("sources_hash") != sources_hash
+                or artifacts.get("intent_model_format") != INTENT_MODEL_FORMAT
+                or artifacts.get("normalization_settings") != NORMALIZATION_SETTINGS):
+            artifacts = None
+    except (FileNotFoundError, ValueError, EOFError, AttributeError, ImportError, pickle.UnpicklingError):
+        artifacts = None
+
+    if artifacts is None:
+        print("Artifacts cache is missing or outdated, rebuilding...")
+        artifacts = build_artifacts(sources_hash)
+        _timed("save_artifacts", save_artifacts, artifacts, file_path)
+
+    if INTENT_MODEL_FORMAT == "compact":
+        artifacts["intent_classifier"] = _timed("load_intent_classifier", get_compact_intent_classifier)
+    artifacts["intent_examples"] = MappingProxyType(artifacts["intent_examples"])
+    set_menu_index(artifacts["menu_index"])
+
+    STARTUP_TIMINGS["load_artifacts_total"] = time.perf_counter() - start
+
+    return artifacts
+
+
+def get_startup_report():
+    """Отчет о времени этапов запуска и ленивой загрузки NLP инструментов"""
+    lines = ["Время запуска:"]
+    for name, seconds in STARTUP_TIMINGS.items():
+        lines.append(f"  {name}: {seconds * 1000:.1f} мс")
+    for name, seconds in MODEL_LOAD_TIMINGS.items():
+        lines.append(f"  model {name}: {seconds * 1000:.1f} мс")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка кэша производных данных бота")
+    parser.add_argument("--output", default=ARTIFACTS_FILE_PATH)
+    args = parser.parse_args()
+
+    if not os.path.exists(MODEL_FILE_PATH):
+        _timed("train_intent_classifier", get_intent_classifier)
+
+    artifacts = build_artifacts(get_sources_hash())
+    _timed("save_artifacts", save_artifacts, artifacts, args.output)
+
+    print(get_startup_report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+SEED = 42
+MESSAGES = [
+    "привет",
+    "покажи меню",
+    "хочу борщ классический",
+    "сколько стоит том ям с креветками",
+    "что у меня в корзине",
+    "как дела?",
+    "что нового?",
+    "оформи заказ",
+    "пока"
+]
+
+
+def make_update(user_id, text, replies):
+    """Создание имитации обновления Telegram с сообщением пользователя"""
+    async def reply_text(reply, **kwargs):
+        replies.append(reply)
+
+    user = SimpleNamespace(id=user_id, username=f"user{user_id}")
+    message = SimpleNamespace(from_user=user, text=text, reply_text=reply_text)
+    return SimpleNamespace(message=message, effective_user=user)
+
+
+async def simulate_user(user_id, messages_count, handler, latencies, rng):
+    """Отправка серии сообщений от одного пользователя с замером задержки ответа"""
+    for _ in range(messages_count):
+        replies = []
+        update = make_update(user_id, rng.choice(MESSAGES), replies)
+        start = time.perf_counter()
+        await handler(update, None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(rng.uniform(0, 0.05))
+
+
+async def run_load(handler, users, messages_count):
+    """Запуск одновременных пользователей и сбор статистики задержек"""
+    rng = random.Random(SEED)
+    latencies = []
+
+    start = time.perf_counter()
+    await asyncio.gather(*(simulate_user(user_id, messages_count, handler, latencies, random.Random(rng.random()))
+                           for user_id in range(users)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "messages": len(latencies),
+        "throughput_per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчика сообщений без Telegram")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--workers", type=int, help="размер пула (по умолчанию MESSAGE_EXECUTOR_WORKERS)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_concurrent_users_") as dir_path:
+        # Пути к файлам читаются при импорте config, поэтому окружение настраивается до импорта бота:
+        # сессии и журнал сообщений пишутся во временный каталог, сервер метрик не запускается
+        os.environ.update(SESSION_DB_FILE_PATH=os.path.join(dir_path, "sessions.sqlite3"),
+                          EVENT_LOG_FILE_PATH=os.path.join(dir_path, "messages.jsonl"), METRICS_HTTP_PORT="0")
+        import main
+        from worker_pool import MessageWorkerPool
+        from config import MESSAGE_EXECUTOR_WORKERS, MESSAGE_QUEUE_SIZE
+
+        results = {}
+        for mode in [None, "thread", "process"]:
+            main.worker_pool = MessageWorkerPool(mode, args.workers or MESSAGE_EXECUTOR_WORKERS, MESSAGE_QUEUE_SIZE,
+                                                 "wait")
+            main.backend.worker_pool = main.worker_pool
+            # Прогрев пула, чтобы загрузка моделей не попала в замеры
+            main.worker_pool.start()
+            results[str(mode)] = asyncio.run(run_load(main.handle_message, args.users, args.messages))
+            main.worker_pool.shutdown()
+        main.backend.bot.sessions.close()
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+
+from benchmarks.fake_bot_api import FakeBotApiServer
+
+from config import MENU_FILE_PATH, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_URL_PATH, WEBHOOK_SECRET_TOKEN
+
+SEED = 42
+# Токен в формате Telegram; запросы с ним уходят только на локальный сервер-имитацию
+FAKE_TOKEN = "123456789:LOAD-TEST-TOKEN-NOT-VALID-FOR-TELEGRAM"
+# Признаки дополнительных сообщений, которые бот отправляет после ответа
+FOLLOWUP_MARKERS = {"apology": "SORRY10", "coupon": "персональный купон"}
+
+# Сценарии разговоров: {dish} и {other_dish} заменяются случайными блюдами из меню
+CONVERSATIONS = {
+    "order": ["/start", "привет", "📋 Меню", "хочу {dish}", "сколько стоит {other_dish}", "добавь {other_dish}",
+              "🛒 Корзина", "✅ Оформить заказ", "спасибо, до свидания"],
+    "browse": ["здравствуйте", "/menu", "что посоветуете?", "сколько стоит {dish}", "во сколько вы работаете?",
+               "/cart", "пока"],
+    "unhappy": ["привет", "хочу {dish}", "это ужасно, вы ничего не понимаете", "отвратительный сервис",
+                "ужасно, ничего не работает", "кошмар, худший бот", "❌ Очистить корзину", "/complete_order"]
+}
+CONVERSATION_WEIGHTS = {"order": 0.6, "browse": 0.3, "unhappy": 0.1}
+
+
+def get_followup_kind(text):
+    """Вид дополнительного сообщения (None, если это ответ на сообщение пользователя)"""
+    for kind, marker in FOLLOWUP_MARKERS.items():
+        if marker in text:
+            return kind
+    return None
+
+
+def make_conversation(rng, dishes):
+    """Случайный сценарий разговора одного пользователя"""
+    name = rng.choices(list(CONVERSATION_WEIGHTS), weights=list(CONVERSATION_WEIGHTS.values()))[0]
+    dish, other_dish = rng.sample(dishes, 2)
+    return name, [text.format(dish=dish, other_dish=other_dish) for text in CONVERSATIONS[name]]
+
+
+def get_percentiles(values):
+    """Перцентили задержки в миллисекундах"""
+    if not values:
+        return {}
+    values = sorted(values)
+    percentiles = {f"p{percentile}_ms": values[min(int(len(values) * percentile / 100), len(values) - 1)] * 1000
+                   for percentile in (50, 90, 99)}
+    percentiles["max_ms"] = values[-1] * 1000
+    return percentiles
+
+
+class MessageRecord:
+    __slots__ = ("sent", "reply_time", "last_time", "followups", "replied")
+
+    def __init__(self):
+        self.sent = time.perf_counter()
+        self.reply_time = None
+        self.last_time = None
+        self.followups = []
+        self.replied = asyncio.get_running_loop().create_future()
+
+
+class LoadGenerator:
+    def __init__(self, reply_timeout_seconds, think_time_seconds):
+        self.reply_timeout_seconds = reply_timeout_seconds
+        self.think_time_seconds = think_time_seconds
+        self.deliver = None
+        self.make_update = None
+        self.records = []
+        self.timeouts = 0
+        self.unexpected_messages = 0
+        self.bot_messages = 0
+        self._unanswered = {}
+        self._last_answered = {}
+
+    def on_message(self, chat_id, text):
+        """Сообщение бота: ответ на самое раннее сообщение пользователя без ответа или дополнительное сообщение"""
+        now = time.perf_counter()
+        self.bot_messages += 1
+
+        # Обновления одного пользователя обрабатываются по очереди, поэтому дополнительные сообщения приходят
+        # после ответа на свое сообщение и до ответа на следующее
+        followup_kind = get_followup_kind(text)
+        if followup_kind is not None:
+            record = self._last_answered.get(chat_id)
+            if record is None:
+                self.unexpected_messages += 1
+                return
+            record.followups.append(followup_kind)
+            record.last_time = now
+            return
+
+        unanswered = self._unanswered.get(chat_id)
+        if not unanswered:
+            self.unexpected_messages += 1
+            return
+        record = unanswered.popleft()
+        record.reply_time = record.last_time = now
+        self._last_answered[chat_id] = record
+        record.replied.set_result(None)
+
+    async def simulate_user(self, user_id, conversation, rng, start_delay):
+        """Разговор одного пользователя: следующее сообщение отправляется после ответа и паузы на размышление"""
+        await asyncio.sleep(start_delay)
+        unanswered = self._unanswered.setdefault(user_id, deque())
+
+        for text in conversation:
+            record = MessageRecord()
+            self.records.append(record)
+            unanswered.append(record)
+            await self.deliver(self.make_update(user_id, text))
+            try:
+                await asyncio.wait_for(asyncio.shield(record.replied), self.reply_timeout_seconds)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+            await asyncio.sleep(rng.uniform(0, 2 * self.think_time_seconds))
+
+    def get_results(self, conversations, elapsed):
+        """Сводка задержек, пропускной способности и дополнительных сообщений"""
+        answered = [record for record in self.records if record.reply_time is not None]
+        followups = Counter(kind for record in answered for kind in record.followups)
+        return {
+            "users": len(conversations),
+            "conversations": dict(Counter(name for name, _ in conversations.values())),
+            "user_messages": len(self.records),
+            "answered": len(answered),
+            "timeouts": self.timeouts,
+            "elapsed_seconds": elapsed,
+            "user_messages_per_second": len(self.records) / elapsed,
+            "bot_messages_per_second": self.bot_messages / elapsed,
+            "followups": dict(followups),
+            "unexpected_messages": self.unexpected_messages,
+            # Время до первого ответа на сообщение
+            "reply_latency": get_percentiles([record.reply_time - record.sent for record in answered]),
+            # Время до последнего сообщения бота, включая извинение или купон
+            "full_latency": get_percentiles([record.last_time - record.sent for record in answered]),
+            "full_latency_with_followups": get_percentiles([record.last_time - record.sent for record in answered
+                                                            if record.followups])
+        }
+
+
+class WebhookDelivery:
+    def __init__(self, host, port, url_path, secret_token, connections):
+        self.host = host
+        self.port = port
+        self.url_path = "/" + url_path.strip("/")
+        self.secret_token = secret_token
+        # Как и Telegram, обновления доставляются через ограниченное количество соединений
+        self.connections_count = connections
+        self._connections = asyncio.Queue()
+
+    async def connect(self, timeout_seconds, bot_process):
+        """Открытие соединений, когда бот начнет принимать обновления"""
+        deadline = time.monotonic() + timeout_seconds
+        while self._connections.qsize() < self.connections_count:
+            try:
+                self._connections.put_nowait(await asyncio.open_connection(self.host, self.port))
+            except OSError:
+                if bot_process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Бот не начал принимать обновления на вебхук")
+                await asyncio.sleep(0.5)
+
+    async def deliver(self, update):
+        """Отправка обновления на вебхук бота"""
+        reader, writer = await self._connections.get()
+        try:
+            body = json.dumps(update, ensure_ascii=False).encode("utf-8")
+            secret_header = (f"X-Telegram-Bot-Api-Secret-Token: {self.secret_token}\r\n"
+                             if self.secret_token is not None else "")
+            writer.write(
+                f"POST {self.url_path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n{secret_header}\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            if status_line.split()[1] != b"200":
+                raise RuntimeError(f"Вебхук отклонил обновление: {status_line.decode('latin-1').strip()}")
+        finally:
+            self._connections.put_nowait((reader, writer))
+
+    def close(self):
+        """Закрытие соединений"""
+        while not self._connections.empty():
+            _, writer = self._connections.get_nowait()
+            writer.close()
+
+
+def start_bot(bot_script, base_url, mode, data_dir_path):
+    """Запуск бота в отдельном процессе с адресом Bot API, указывающим на сервер-имитацию"""
+    # Сессии и журнал сообщений пишутся во временный каталог, сервер метрик не запускается,
+    # чтобы тест не затрагивал рабочие данные и не конфликтовал с запущенным ботом
+    environment = dict(os.environ, TELEGRAM_TOKEN=FAKE_TOKEN, TELEGRAM_API_BASE_URL=base_url, BOT_RUN_MODE=mode,
+                       SESSION_DB_FILE_PATH=os.path.join(data_dir_path, "sessions.sqlite3"),
+                       EVENT_LOG_FILE_PATH=os.path.join(data_dir_path, "messages.jsonl"), METRICS_HTTP_PORT="0")
+    return subprocess.Popen([sys.executable, bot_script], env=environment)
+
+
+def stop_bot(bot_process):
+    """Остановка бота так же, как по Ctrl+C, чтобы он записал сессии"""
+    if bot_process.poll() is not None:
+        return
+    if os.name == "nt":
+        bot_process.terminate()
+    else:
+        bot_process.send_signal(signal.SIGINT)
+    try:
+        bot_process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        bot_process.kill()
+
+
+async def wait_for_polling(fake_api, bot_process, timeout_seconds):
+    """Ожидание первого запроса getUpdates (бот загрузил модели и начал опрос)"""
+    deadline = time.monotonic() + timeout_seconds
+    while not fake_api.ready.is_set():
+        if bot_process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Бот не начал опрос обновлений")
+        try:
+            await asyncio.wait_for(fake_api.ready.wait(), 1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(args):
+    """Запуск сервера-имитации и бота, прогон разговоров всех пользователей"""
+    rng = random.Random(SEED)
+    with open(MENU_FILE_PATH, "r", encoding="utf-8") as file:
+        dishes = [dish["name_lower"] for dish in json.load(file).values()]
+    conversations = {100000 + user_index: make_conversation(rng, dishes) for user_index in range(args.users)}
+
+    generator = LoadGenerator(args.reply_timeout, args.think_time_ms / 1000)
+    fake_api = FakeBotApiServer(on_message=generator.on_message)
+    await fake_api.start()
+    generator.make_update = fake_api.make_message_update
+
+    data_dir = tempfile.TemporaryDirectory(prefix="bench_end_to_end_")
+    bot_process = start_bot(args.bot_script, fake_api.base_url, args.mode, data_dir.name)
+    webhook_delivery = None
+    try:
+        if args.mode == "webhook":
+            webhook_delivery = WebhookDelivery(WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_URL_PATH, WEBHOOK_SECRET_TOKEN,
+                                               args.webhook_connections)
+            await webhook_delivery.connect(args.startup_timeout, bot_process)
+            generator.deliver = webhook_delivery.deliver
+        else:
+            await wait_for_polling(fake_api, bot_process, args.startup_timeout)
+
+            async def deliver(update):
+                fake_api.push_update(update)
+
+            generator.deliver = deliver
+        print(f"Бот запущен, начинается нагрузка: {args.users} пользователей")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(generator.simulate_user(user_id, conversation, random.Random(rng.random()),
+                                                       rng.uniform(0, args.ramp_up_seconds))
+                               for user_id, (_, conversation) in conversations.items()))
+        elapsed = time.perf_counter() - start
+    finally:
+        if webhook_delivery is not None:
+            webhook_delivery.close()
+        await asyncio.get_running_loop().run_in_executor(None, stop_bot, bot_process)
+        await fake_api.stop()
+        data_dir.cleanup()
+
+    return generator.get_results(conversations, elapsed)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Сквозной нагрузочный тест main.py через локальную имитацию Bot API")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--mode", choices=["polling", "webhook"], default="polling")
+    parser.add_argument("--think-time-ms", type=float, default=500, help="средняя пауза пользователя между сообщениями")
+    parser.add_argument("--ramp-up-seconds", type=float, default=5, help="интервал, за который подключаются пользователи")
+    parser.add_argument("--reply-timeout", type=float, default=30, help="время ожидания ответа на сообщение, с")
+    parser.add_argument("--webhook-connections", type=int, default=40)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--bot-script", default="main.py")
+    parser.add_argument("--output", help="файл для сохранения результатов в формате JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args))
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main_cli()
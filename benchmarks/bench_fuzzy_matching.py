@@ -0,0 +1,99 @@
+import json
+import random
+import time
+
+import nltk
+
+from data_preparation import get_menu, get_intent_dataset
+from fuzzy_matching import has_close_match, find_nearest, batch_edit_distance, bounded_edit_distance
+
+from config import INTENT_DATASET_FILE_PATH, MENU_FILE_PATH
+
+SEED = 42
+QUERIES_COUNT = 300
+
+
+def make_typo(text, rng):
+    """Внесение случайных опечаток в текст"""
+    chars = list(text)
+    for _ in range(rng.randint(0, 3)):
+        if not chars:
+            break
+        position = rng.randrange(len(chars))
+        operation = rng.choice(["delete", "insert", "replace"])
+        if operation == "delete":
+            del chars[position]
+        elif operation == "insert":
+            chars.insert(position, rng.choice("абвгдеёжзийклмнопрстуфхцчшщъыьэюя "))
+        else:
+            chars[position] = rng.choice("абвгдеёжзийклмнопрстуфхцчшщъыьэюя ")
+    return "".join(chars)
+
+
+def reference_has_close_match(text, candidates, ratio):
+    """Проверка близкого примера прежним способом через nltk.edit_distance"""
+    return any(candidate and nltk.edit_distance(text, candidate) / len(candidate) <= ratio
+               for candidate in candidates)
+
+
+def reference_find_nearest(text, candidates, ratio):
+    """Поиск ближайшего кандидата прежним способом через nltk.edit_distance"""
+    responses = []
+    for index, candidate in enumerate(candidates):
+        if abs(len(text) - len(candidate)) / len(candidate) < ratio:
+            weighted_distance = nltk.edit_distance(text, candidate) / len(candidate)
+            if weighted_distance < ratio:
+                responses.append([weighted_distance, index])
+    if responses:
+        return min(responses, key=lambda x: x[0])[1]
+    return None
+
+
+def main():
+    rng = random.Random(SEED)
+
+    dataset = get_intent_dataset(INTENT_DATASET_FILE_PATH, get_menu(MENU_FILE_PATH))
+    candidates = sorted({example.lower() for intent_data in dataset["intents"].values()
+                         for example in intent_data["examples"]})
+    queries = [make_typo(rng.choice(candidates), rng) for _ in range(QUERIES_COUNT)]
+
+    # Проверка совпадения результатов с nltk.edit_distance
+    mismatches = 0
+    for query in queries:
+        for candidate in rng.sample(candidates, 20):
+            distance = nltk.edit_distance(query, candidate)
+            if batch_edit_distance(query, [candidate])[0] != distance:
+                mismatches += 1
+            expected_bounded_distance = distance if distance <= 4 else 5
+            if bounded_edit_distance(query, candidate, 4) != expected_bounded_distance:
+                mismatches += 1
+
+        nearest = find_nearest(query, candidates, 0.2)
+        if (nearest[0] if nearest is not None else None) != reference_find_nearest(query, candidates, 0.2):
+            mismatches += 1
+        if has_close_match(query, candidates, 0.5) != reference_has_close_match(query, candidates, 0.5):
+            mismatches += 1
+    assert mismatches == 0, f"Результаты расходятся с nltk.edit_distance в {mismatches} проверках"
+
+    # Сравнение времени поиска ближайшего кандидата
+    start = time.perf_counter()
+    for query in queries:
+        reference_find_nearest(query, candidates, 0.2)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query in queries:
+        find_nearest(query, candidates, 0.2)
+    fast_time = time.perf_counter() - start
+
+    print(json.dumps({
+        "candidates": len(candidates),
+        "queries": len(queries),
+        "mismatches": mismatches,
+        "nltk_ms_per_query": reference_time / len(queries) * 1000,
+        "fuzzy_matching_ms_per_query": fast_time / len(queries) * 1000
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from intent_classifier import IntentClassifier, CompactIntentClassifier, prepare_intents_dataset_for_model
+
+from config import INTENT_DATASET_FILE_PATH, MODEL_FILE_PATH
+
+REPEATS = 5
+# Допустимое расхождение значений решающей функции (float32 в sklearn против float64 в компактной модели)
+CONFIDENCE_TOLERANCE = 1e-5
+
+
+def measure_load(load, path):
+    """Среднее время загрузки модели в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        load(path)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def measure_latency(classifier, texts):
+    """Среднее время предсказания для одного сообщения в миллисекундах"""
+    start = time.perf_counter()
+    for text in texts:
+        classifier.predict_batch([text])
+    return (time.perf_counter() - start) / len(texts) * 1000
+
+
+def main():
+    texts, _, _ = prepare_intents_dataset_for_model(INTENT_DATASET_FILE_PATH)
+    classifier = IntentClassifier.load(MODEL_FILE_PATH)
+
+    with tempfile.TemporaryDirectory() as dir_path:
+        classifier.export_compact(dir_path)
+        compact_classifier = CompactIntentClassifier.load(dir_path)
+
+        # Проверка совпадения предсказаний и значений решающей функции с конвейером sklearn
+        labels, confidences = classifier.predict_batch(texts)
+        compact_labels, compact_confidences = compact_classifier.predict_batch(texts)
+        label_mismatches = sum(label != compact_label for label, compact_label in zip(labels, compact_labels))
+        max_confidence_error = float(np.max(np.abs(np.array(confidences) - np.array(compact_confidences))))
+        assert label_mismatches == 0, f"Компактная модель расходится с sklearn на {label_mismatches} текстах"
+        assert max_confidence_error <= CONFIDENCE_TOLERANCE, f"Расхождение уверенности {max_confidence_error:.2e}"
+
+        compact_size = sum(os.path.getsize(os.path.join(dir_path, name)) for name in os.listdir(dir_path))
+
+        results = {
+            "texts": len(texts),
+            "label_mismatches": label_mismatches,
+            "max_confidence_error": max_confidence_error,
+            "sklearn": {
+                "size_bytes": os.path.getsize(MODEL_FILE_PATH),
+                "load_ms": measure_load(IntentClassifier.load, MODEL_FILE_PATH),
+                "latency_ms": measure_latency(classifier, texts)
+            },
+            "compact": {
+                "size_bytes": compact_size,
+                "load_ms": measure_load(CompactIntentClassifier.load, dir_path),
+                "latency_ms": measure_latency(compact_classifier, texts)
+            }
+        }
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import functools
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+import bot_logic
+import nlp_functions
+from bot_logic import RestaurantAssistantBot
+
+from config import DIALOGUES_FILE_PATH
+
+SEED = 42
+FIXTURE_FILE_PATH = "benchmarks/fixtures/messages.jsonl"
+RESULTS_DIR_PATH = "benchmarks/results"
+
+# Этапы обработки сообщения: имя этапа -> (модуль, атрибут), через который этап вызывается
+STAGES = {
+    "clean_text": (nlp_functions, "clean_text"),
+    "correct_text": (nlp_functions, "correct_text"),
+    "lemmatize_text": (nlp_functions, "lemmatize_text"),
+    "extract_entities": (bot_logic, "extract_entities"),
+    "analyze_sentiment": (bot_logic, "analyze_sentiment"),
+    "intent_predict": (bot_logic.INTENT_CLASSIFIER, "predict_batch"),
+    "intent_confirmation": (bot_logic, "has_close_match"),
+    "generate_response": (bot_logic, "generate_response")
+}
+
+
+def load_corpus(file_path, dialogues_count):
+    """Загрузка сообщений из JSONL-файла и добавление вопросов из датасета диалогов"""
+    messages = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                message = json.loads(line)
+                messages.append((str(message.get("user_id", "0")), message["text"]))
+
+    if dialogues_count > 0:
+        with open(DIALOGUES_FILE_PATH, "r", encoding="utf8") as file:
+            questions = [raw_dialogue.split('\n')[0][2:] for raw_dialogue in file.read().split('\n\n') if raw_dialogue]
+        rng = random.Random(SEED)
+        for index in range(dialogues_count):
+            messages.append((f"dialogue{index % 10}", rng.choice(questions)))
+
+    return messages
+
+
+def instrument_stages(stage_timings):
+    """Подмена функций этапов обертками, накапливающими время их выполнения"""
+    originals = {}
+
+    for name, (owner, attribute) in STAGES.items():
+        function = getattr(owner, attribute)
+        originals[name] = function
+
+        def wrapper(*args, _function=function, _name=name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _function(*args, **kwargs)
+            finally:
+                stage_timings[_name].append((time.perf_counter() - start) * 1000)
+
+        setattr(owner, attribute, functools.wraps(function)(wrapper))
+
+    return originals
+
+
+def restore_stages(originals):
+    """Возврат исходных функций этапов"""
+    for name, (owner, attribute) in STAGES.items():
+        setattr(owner, attribute, originals[name])
+
+
+def percentile(values, q):
+    """Перцентиль по отсортированному списку значений"""
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def summarize(values, messages_count):
+    """Сводная статистика по списку задержек в миллисекундах"""
+    values = sorted(values)
+    return {
+        "calls": len(values),
+        "total_ms": sum(values),
+        "per_message_ms": sum(values) / messages_count,
+        "p50_ms": percentile(values, 0.5),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99)
+    }
+
+
+def run(messages, repeats):
+    """Прогон сообщений через бота без Telegram с замером общей задержки и задержки этапов"""
+    # Сессии хранятся только в памяти, чтобы не открывать рабочую базу сессий
+    bot = RestaurantAssistantBot(session_store_backend="memory")
+
+    # Прогрев моделей и кэшей, чтобы их загрузка не попала в замеры
+    bot_logic.warm_up()
+
+    stage_timings = {name: [] for name in STAGES}
+    latencies = []
+
+    originals = instrument_stages(stage_timings)
+    try:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for user_id, text in messages:
+                message_start = time.perf_counter()
+                bot.handle_message(text, user_id)
+                latencies.append((time.perf_counter() - message_start) * 1000)
+        elapsed = time.perf_counter() - start
+    finally:
+        restore_stages(originals)
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "messages": len(latencies),
+        "throughput_per_second": len(latencies) / elapsed,
+        "latency": summarize(latencies, len(latencies)),
+        # Время этапов включает вложенные вызовы (например, лемматизация внутри анализа тональности)
+        "stages": {name: summarize(values, len(latencies)) for name, values in stage_timings.items()}
+    }
+
+
+def compare(results, previous_results):
+    """Вывод изменения основных показателей относительно предыдущего прогона"""
+    print("Сравнение с предыдущим прогоном (было -> стало):")
+    print(f"  throughput_per_second: {previous_results['throughput_per_second']:.1f} -> "
+          f"{results['throughput_per_second']:.1f}")
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        print(f"  {key}: {previous_results['latency'][key]:.2f} -> {results['latency'][key]:.2f}")
+    for name, stage in results["stages"].items():
+        previous_stage = previous_results["stages"].get(name)
+        if previous_stage is not None:
+            print(f"  {name} per_message_ms: {previous_stage['per_message_ms']:.2f} -> {stage['per_message_ms']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер производительности обработки сообщений ботом")
+    parser.add_argument("--corpus", default=FIXTURE_FILE_PATH, help="JSONL-файл с полями text и user_id")
+    parser.add_argument("--dialogues", type=int, default=200, help="количество вопросов из датасета диалогов")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="файл для сохранения результатов в формате JSON")
+    parser.add_argument("--compare", default=None, help="файл с результатами предыдущего прогона")
+    args = parser.parse_args()
+
+    messages = load_corpus(args.corpus, args.dialogues)
+    results = run(messages, args.repeats)
+
+    output_file_path = args.output
+    if output_file_path is None:
+        os.makedirs(RESULTS_DIR_PATH, exist_ok=True)
+        output_file_path = os.path.join(RESULTS_DIR_PATH,
+                                        f"message_handling_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_file_path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2, ensure_ascii=False)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"Результаты сохранены в {output_file_path}")
+
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
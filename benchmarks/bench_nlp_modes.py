@@ -0,0 +1,57 @@
+import json
+import random
+import statistics
+import time
+
+from nlp_functions import analyze, clean_text, correct_text
+
+from config import DIALOGUES_FILE_PATH
+
+SEED = 42
+MESSAGES_COUNT = 500
+
+
+def get_messages(file_path, count):
+    """Выборка реплик пользователей из датасета диалогов"""
+    with open(file_path, "r", encoding="utf8") as file:
+        content = file.read()
+
+    questions = [raw_dialogue.split('\n')[0][2:] for raw_dialogue in content.split('\n\n') if raw_dialogue]
+    rng = random.Random(SEED)
+    return [rng.choice(questions) for _ in range(count)]
+
+
+def measure(messages, **analyze_kwargs):
+    """Замер задержки разбора одного сообщения в миллисекундах"""
+    latencies = []
+    for message in messages:
+        prepared_message = correct_text(clean_text(message))
+        start = time.perf_counter()
+        analyze(prepared_message, **analyze_kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1]
+    }
+
+
+def main():
+    messages = get_messages(DIALOGUES_FILE_PATH, MESSAGES_COUNT)
+
+    # Прогрев моделей перед замерами
+    analyze(messages[0], entities=True, fast=False)
+    analyze(messages[0], fast=True)
+
+    print(json.dumps({
+        "messages": len(messages),
+        "natasha": measure(messages, fast=False),
+        "pymorphy2": measure(messages, fast=True),
+        "natasha_with_entities": measure(messages, entities=True, fast=False)
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
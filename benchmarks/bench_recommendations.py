@@ -0,0 +1,89 @@
+import random
+import time
+
+from data_preparation import get_menu
+from recommender import MenuRecommender, FEATURES
+
+from config import MENU_FILE_PATH
+
+SEED = 42
+ORDERS_COUNT = 300
+LOCATIONS_COUNT = 200
+
+
+def reference_find_recommendation(menu, cart):
+    """Поиск рекомендации прежним способом: цикл по меню с проверкой каждого блюда по всей корзине"""
+    stats = {feature: sum(item[feature] for item in cart) / len(cart) for feature in FEATURES}
+
+    best_match = None
+    best_score = -1
+    for item_data in menu.values():
+        if any(cart_item['name_lower'] == item_data["name_lower"] for cart_item in cart):
+            continue
+
+        score = 0.0
+        score += 1.0 - abs(item_data['spiciness'] - stats['spiciness'])
+        score += 1.0 - abs(item_data['saltiness'] - stats['saltiness'])
+        score += 1.0 - abs(item_data['sweetness'] - stats['sweetness'])
+        if stats['vegetarian'] > 0.5 and item_data['vegetarian'] < 0.5:
+            score -= 0.5
+        if stats['vegetarian'] < 0.5 and item_data['vegetarian'] > 0.5:
+            score -= 0.15
+        if stats['sweetness'] > 0.5 and item_data['sweetness'] < 0.3:
+            score -= 0.2
+        if stats['sweetness'] < 0.3 and item_data['sweetness'] > 0.7:
+            score += 0.2
+
+        if score > best_score:
+            best_score = score
+            best_match = item_data
+
+    return best_match
+
+
+def expand_menu(menu, locations_count):
+    """Синтетическое меню нескольких заведений: копии блюд с другими названиями"""
+    expanded_menu = {}
+    for location in range(locations_count):
+        for dish_id, dish_data in menu.items():
+            expanded_dish_id = f"{dish_id} #{location}"
+            expanded_menu[expanded_dish_id] = dict(dish_data, name_lower=expanded_dish_id)
+    return expanded_menu
+
+
+def measure(menu, orders):
+    """Сравнение результатов и времени прежнего и векторизованного поиска рекомендации"""
+    recommender = MenuRecommender(menu)
+
+    for order in orders:
+        expected = reference_find_recommendation(menu, [menu[dish_id] for dish_id in order])
+        actual = recommender.recommend(order)
+        assert expected is menu[actual[0]], (order, expected, actual)
+
+    start = time.perf_counter()
+    for order in orders:
+        reference_find_recommendation(menu, [menu[dish_id] for dish_id in order])
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for order in orders:
+        recommender.recommend(order, 3)
+    vectorized_time = time.perf_counter() - start
+
+    print(f"Блюд в меню: {len(menu)}")
+    print(f"  цикл по меню: {reference_time / len(orders) * 1000:.3f} мс на заказ")
+    print(f"  NumPy, top-3: {vectorized_time / len(orders) * 1000:.3f} мс на заказ")
+
+
+def main():
+    rng = random.Random(SEED)
+    menu = get_menu(MENU_FILE_PATH)
+
+    for current_menu in (menu, expand_menu(menu, LOCATIONS_COUNT)):
+        dish_ids = list(current_menu)
+        orders = [rng.sample(dish_ids, rng.randint(1, min(8, len(dish_ids) - 1))) for _ in range(ORDERS_COUNT)]
+        measure(current_menu, orders)
+
+
+if __name__ == '__main__':
+    main()
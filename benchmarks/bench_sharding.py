@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from sharding import ShardRouter
+
+from config import SHARD_HOST, SHARD_BASE_PORT
+
+SEED = 42
+MESSAGES = [
+    "привет",
+    "хочу борщ классический",
+    "добавь том ям с креветками",
+    "сколько стоит бизнес-ланч",
+    "что у меня в корзине",
+    "это ужасно, вы ничего не понимаете",
+    "отлично, спасибо",
+    "как дела?",
+    "пока"
+]
+# Поля сессии, которые могут отличаться при одинаковой истории сообщений
+VOLATILE_FIELDS = ("last_seen",)
+
+
+def make_scripts(users, messages_count):
+    """Заранее определенные последовательности сообщений пользователей"""
+    rng = random.Random(SEED)
+    return {str(100000 + user_index): [rng.choice(MESSAGES) for _ in range(messages_count)]
+            for user_index in range(users)}
+
+
+async def run_user(router, user_id, script, latencies):
+    """Последовательная отправка сообщений одного пользователя, как при обработке его обновлений по очереди"""
+    for text in script:
+        start = time.perf_counter()
+        await router.process_message(text, user_id)
+        await router.get_followup_messages(user_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_traffic(router, scripts, reshard_plan):
+    """Одновременная отправка сообщений всех пользователей; изменение количества шардов во время нагрузки"""
+    latencies = []
+    loop = asyncio.get_running_loop()
+
+    async def reshard():
+        for delay, shard_count in reshard_plan:
+            await asyncio.sleep(delay)
+            moved_count = await loop.run_in_executor(None, router.reshard, shard_count)
+            print(f"  решардинг до {shard_count} шардов: перенесено сессий {moved_count}")
+
+    start = time.perf_counter()
+    await asyncio.gather(reshard(), *(run_user(router, user_id, script, latencies)
+                                      for user_id, script in scripts.items()))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "messages": len(latencies),
+        "throughput_per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    }
+
+
+def collect_states(router):
+    """Сессии всех пользователей по шардам с проверкой, что каждый пользователь есть ровно в одном шарде"""
+    owners = {}
+    states = {}
+    for shard_name in sorted(router.connections):
+        for user_id in router.call(shard_name, "user_ids"):
+            assert user_id not in owners, f"Пользователь {user_id} есть в {owners[user_id]} и в {shard_name}"
+            owners[user_id] = shard_name
+            state = router.call(shard_name, "get_user_state", user_id)
+            states[user_id] = {key: value for key, value in state.items() if key not in VOLATILE_FIELDS}
+
+    for user_id, shard_name in owners.items():
+        expected_shard_name = router.ring.get_shard(user_id)
+        assert shard_name == expected_shard_name, f"Пользователь {user_id} в {shard_name}, а не в {expected_shard_name}"
+
+    return states
+
+
+def compare_states(states, reference_states):
+    """Сравнение состояний пользователей с эталонным прогоном без шардирования"""
+    assert set(states) == set(reference_states), "Набор пользователей отличается от эталонного"
+    for user_id, reference_state in reference_states.items():
+        assert states[user_id] == reference_state, f"Состояние пользователя {user_id} отличается от эталонного"
+
+
+def run_router(shard_count, db_file_path, scripts, reshard_plan=(), port_offset=0):
+    """Запуск шардов, прогон сообщений и сбор итоговых состояний пользователей"""
+    router = ShardRouter(shard_count, SHARD_HOST, SHARD_BASE_PORT + port_offset, "sqlite", db_file_path)
+    router.start()
+    try:
+        results = asyncio.run(run_traffic(router, scripts, reshard_plan))
+        return results, collect_states(router)
+    finally:
+        router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка шардирования: состояние пользователя не разделяется "
+                                                 "между шардами, в том числе при решардинге")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--shards", type=int, default=3)
+    args = parser.parse_args()
+
+    scripts = make_scripts(args.users, args.messages)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as temp_dir_path:
+        print("Эталонный прогон на одном шарде")
+        results["reference"], reference_states = run_router(1, os.path.join(temp_dir_path, "reference.sqlite3"),
+                                                            scripts)
+
+        print(f"Прогон на {args.shards} шардах с решардингом под нагрузкой")
+        db_file_path = os.path.join(temp_dir_path, "sessions.sqlite3")
+        reshard_plan = [(0.5, args.shards + 2), (0.5, max(args.shards - 1, 1))]
+        results["sharded"], states = run_router(args.shards, db_file_path, scripts, reshard_plan, port_offset=10)
+        compare_states(states, reference_states)
+
+        # Перезапуск с другим количеством шардов: сессии переносятся из баз прошлого запуска
+        print(f"Перезапуск на {args.shards + 1} шардах")
+        router = ShardRouter(args.shards + 1, SHARD_HOST, SHARD_BASE_PORT + 20, "sqlite", db_file_path)
+        router.start()
+        try:
+            compare_states(collect_states(router), reference_states)
+        finally:
+            router.shutdown()
+
+    print("Состояние каждого пользователя находится ровно в одном шарде и совпадает с эталонным")
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
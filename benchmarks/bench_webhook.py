@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+from telegram.request import BaseRequest
+
+from webhook_server import WebhookServer
+
+SEED = 42
+SECRET_TOKEN = "bench-secret"
+MESSAGES = [
+    "привет",
+    "📋 Меню",
+    "хочу борщ классический",
+    "сколько стоит том ям с креветками",
+    "🛒 Корзина",
+    "это ужасно, вы ничего не понимаете",
+    "как дела?",
+    "✅ Оформить заказ",
+    "пока"
+]
+
+
+class RecordingRequest(BaseRequest):
+    def __init__(self, latency_seconds):
+        # Задержка имитирует время ответа Bot API, запросы к Telegram не отправляются
+        self.latency_seconds = latency_seconds
+        self.sent_messages = {}
+        self._message_id = 0
+
+    async def initialize(self):
+        """Ресурсы не требуются"""
+
+    async def shutdown(self):
+        """Ресурсы не требуются"""
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        """Ответ на вызов метода Bot API с запоминанием отправленных сообщений"""
+        await asyncio.sleep(self.latency_seconds)
+        api_method = url.rsplit("/", 1)[1]
+        parameters = request_data.parameters if request_data is not None else {}
+
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif api_method == "sendMessage":
+            self._message_id += 1
+            chat_id = int(parameters["chat_id"])
+            self.sent_messages.setdefault(chat_id, []).append(parameters["text"])
+            result = {"message_id": self._message_id, "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "text": parameters["text"]}
+        else:
+            result = True
+
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+
+def make_update(update_id, user_id, text):
+    """Обновление Telegram с сообщением пользователя в формате Bot API"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "date": int(time.time()), "chat": {"id": user_id, "type": "private"},
+                    "from": user, "text": text}
+    }
+
+
+class OrderChecker:
+    def __init__(self):
+        self.processed = {}
+        self.in_progress = set()
+        self.violations = 0
+
+    async def on_start(self, update, context):
+        """Начало обработки: у пользователя не должно быть других обрабатываемых обновлений"""
+        user_id = update.effective_user.id
+        if user_id in self.in_progress:
+            self.violations += 1
+        self.in_progress.add(user_id)
+        self.processed.setdefault(user_id, []).append(update.update_id)
+
+    async def on_finish(self, update, context):
+        """Завершение обработки всех обработчиков обновления"""
+        self.in_progress.discard(update.effective_user.id)
+
+
+async def post_updates(host, port, path, updates):
+    """Отправка обновлений одного пользователя по очереди через одно keep-alive соединение, как это делает Telegram"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for update in updates:
+            body = json.dumps(update, ensure_ascii=False).encode("utf-8")
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nX-Telegram-Bot-Api-Secret-Token: {SECRET_TOKEN}\r\n\r\n"
+                .encode("latin-1") + body
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            assert status_line.split()[1] == b"200", status_line
+            # Ответ вебхука не содержит тела
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+    finally:
+        writer.close()
+
+
+async def run_load(main, users, messages_count, api_latency_seconds):
+    """Отправка синтетических обновлений на вебхук и ожидание их обработки"""
+    rng = random.Random(SEED)
+    request = RecordingRequest(api_latency_seconds)
+    app = main.build_application(request)
+    checker = OrderChecker()
+    app.add_handler(TypeHandler(Update, checker.on_start), group=-1)
+    app.add_handler(TypeHandler(Update, checker.on_finish), group=1)
+
+    update_ids = iter(range(1, users * messages_count + 1))
+    scripts = {100000 + user_index: [make_update(next(update_ids), 100000 + user_index, rng.choice(MESSAGES))
+                                     for _ in range(messages_count)]
+               for user_index in range(users)}
+
+    async with app:
+        await app.start()
+        webhook_server = WebhookServer(app, "127.0.0.1", 0, main.WEBHOOK_URL_PATH, SECRET_TOKEN)
+        await webhook_server.start()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post_updates("127.0.0.1", webhook_server.port, webhook_server.url_path, updates)
+                               for updates in scripts.values()))
+        accepted = time.perf_counter() - start
+        # Счетчик очереди уменьшается только после завершения обработки обновления
+        await app.update_queue.join()
+        elapsed = time.perf_counter() - start
+
+        await webhook_server.stop()
+        await app.stop()
+
+    for user_id, updates in scripts.items():
+        expected_update_ids = [update["update_id"] for update in updates]
+        assert checker.processed[user_id] == expected_update_ids, f"Нарушен порядок обновлений пользователя {user_id}"
+        assert len(request.sent_messages[user_id]) >= messages_count, f"Не все ответы отправлены {user_id}"
+    assert checker.violations == 0, "Обновления одного пользователя обрабатывались одновременно"
+
+    updates_count = users * messages_count
+    return {
+        "updates": updates_count,
+        "accepted_per_second": updates_count / accepted,
+        "processed_per_second": updates_count / elapsed,
+        "sent_messages": sum(len(messages) for messages in request.sent_messages.values())
+    }
+
+
+async def run_all(main, users, messages_count, api_latency_seconds, concurrency_levels):
+    """Прогоны с разным количеством одновременно выполняемых обработчиков в одном цикле событий"""
+    results = {}
+    for concurrency in concurrency_levels:
+        main.UPDATE_MAX_CONCURRENT = concurrency
+        results[concurrency] = await run_load(main, users, messages_count, api_latency_seconds)
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Проверка режима вебхука синтетическими обновлениями без Telegram")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--api-latency-ms", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 256])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_webhook_") as dir_path:
+        # Пути к файлам читаются при импорте config, поэтому окружение настраивается до импорта бота:
+        # сессии синтетических пользователей и журнал сообщений пишутся во временный каталог
+        os.environ.update(SESSION_DB_FILE_PATH=os.path.join(dir_path, "sessions.sqlite3"),
+                          EVENT_LOG_FILE_PATH=os.path.join(dir_path, "messages.jsonl"), METRICS_HTTP_PORT="0")
+        import main
+
+        main.BOT_RUN_MODE = "webhook"
+        main.backend.start()
+        try:
+            results = asyncio.run(run_all(main, args.users, args.messages, args.api_latency_ms / 1000,
+                                          args.concurrency))
+        finally:
+            main.backend.shutdown()
+
+    print("Порядок обновлений каждого пользователя сохранен")
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main_cli()
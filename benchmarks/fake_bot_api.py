@@ -0,0 +1,157 @@
+import asyncio
+import json
+import time
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+# Данные бота, которые возвращает метод getMe
+BOT_USER = {"id": 1000000001, "is_bot": True, "first_name": "Restaurant Bot", "username": "restaurant_load_test_bot",
+            "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+class FakeBotApiServer:
+    def __init__(self, host="127.0.0.1", port=0, on_message=None):
+        self.host = host
+        self.port = port
+        # Вызывается для каждого сообщения, отправленного ботом: on_message(chat_id, text)
+        self.on_message = on_message
+        self.calls = {}
+        self.ready = asyncio.Event()
+        self._updates = deque()
+        self._updates_available = asyncio.Event()
+        self._update_id = 0
+        self._message_id = 0
+        self._server = None
+        self._connection_tasks = set()
+
+    @property
+    def base_url(self):
+        """Адрес, который передается боту вместо https://api.telegram.org"""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """Запуск HTTP-сервера в текущем цикле событий"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Остановка сервера с прерыванием незавершенных длинных опросов"""
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._connection_tasks):
+                task.cancel()
+            await asyncio.gather(*self._connection_tasks, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def make_message_update(self, user_id, text):
+        """Обновление с сообщением пользователя; команды размечаются так же, как это делает Telegram"""
+        self._update_id += 1
+        self._message_id += 1
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User {user_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"user{user_id}"},
+            "text": text
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split(" ", 1)[0])}]
+        return {"update_id": self._update_id, "message": message}
+
+    def push_update(self, update):
+        """Постановка обновления в очередь, которую бот забирает методом getUpdates"""
+        self._updates.append(update)
+        self._updates_available.set()
+
+    async def _handle_connection(self, reader, writer):
+        """Обработка запросов одного keep-alive соединения бота"""
+        task = asyncio.current_task()
+        self._connection_tasks.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self._call_method(path.split("?", 1)[0].rsplit("/", 1)[1],
+                                                          self._parse_parameters(headers, body))
+                response_body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(response_body)}\r\n\r\n".encode("latin-1") + response_body
+                )
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Соединение прервано остановкой сервера
+            pass
+        finally:
+            self._connection_tasks.discard(task)
+            writer.close()
+
+    @staticmethod
+    def _parse_parameters(headers, body):
+        """Параметры метода в виде строк (python-telegram-bot передает их формой; вложенные объекты - строками JSON)"""
+        if not body:
+            return {}
+        if headers.get("content-type", "").startswith("application/json"):
+            return json.loads(body)
+        return {name: values[0] for name, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items()}
+
+    async def _call_method(self, method, parameters):
+        """Ответ на вызов метода Bot API"""
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == "getMe":
+            return HTTPStatus.OK, {"ok": True, "result": BOT_USER}
+        if method == "getUpdates":
+            self.ready.set()
+            return HTTPStatus.OK, {"ok": True, "result": await self._get_updates(parameters)}
+        if method == "sendMessage":
+            return HTTPStatus.OK, {"ok": True, "result": self._send_message(parameters)}
+        # Остальные методы (deleteWebhook, setWebhook и т.д.) только подтверждаются
+        return HTTPStatus.OK, {"ok": True, "result": True}
+
+    async def _get_updates(self, parameters):
+        """Длинный опрос: обновления после offset или ожидание новых до истечения timeout"""
+        offset = int(parameters.get("offset") or 0)
+        limit = int(parameters.get("limit") or 100)
+        timeout = float(parameters.get("timeout") or 0)
+
+        # Обновления с номером меньше offset подтверждены ботом
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+
+        if not self._updates and timeout > 0:
+            self._updates_available.clear()
+            try:
+                await asyncio.wait_for(self._updates_available.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        return [update for _, update in zip(range(limit), self._updates)]
+
+    def _send_message(self, parameters):
+        """Отправленное ботом сообщение передается генератору нагрузки"""
+        chat_id = int(parameters["chat_id"])
+        text = parameters["text"]
+        if self.on_message is not None:
+            self.on_message(chat_id, text)
+
+        self._message_id += 1
+        return {"message_id": self._message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": f"User {chat_id}"},
+                "from": {key: BOT_USER[key] for key in ("id", "is_bot", "first_name", "username")}, "text": text}
@@ -0,0 +1,54 @@
+class LocalBotBackend:
+    def __init__(self, bot, worker_pool, intent_batcher=None):
+        self.bot = bot
+        self.worker_pool = worker_pool
+        self.intent_batcher = intent_batcher
+
+    async def analyze(self, text):
+        """Анализ сообщения в пуле; намерения одновременно обрабатываемых сообщений предсказываются одним пакетом"""
+        if self.intent_batcher is None:
+            return await self.worker_pool.analyze(text)
+
+        prepared_text = await self.worker_pool.prepare(text)
+        prediction = await self.intent_batcher.predict(prepared_text)
+        return await self.worker_pool.analyze(text, prepared_text, prediction)
+
+    async def process_message(self, text, user_id):
+        """Ответ на сообщение пользователя вместе с распознанным намерением"""
+        analysis = await self.analyze(text)
+        response = self.bot.handle_analysis(analysis, user_id)
+        return {"response": response, "intent": analysis["intent"], "confidence": float(analysis["confidence"])}
+
+    async def show_menu(self, page=1):
+        """Текст страницы меню"""
+        return self.bot.show_menu(page)
+
+    async def show_cart(self, user_id):
+        """Текст содержимого корзины"""
+        return self.bot.show_cart(user_id)
+
+    async def clear_cart(self, user_id):
+        """Очистка корзины"""
+        return self.bot.clear_cart(user_id)
+
+    async def complete_order(self, user_id):
+        """Оформление заказа"""
+        return self.bot.complete_order(user_id)
+
+    async def get_followup_messages(self, user_id):
+        """Дополнительные сообщения после ответа (извинение или купон)"""
+        return self.bot.get_followup_messages(user_id)
+
+    async def maintain_sessions(self):
+        """Запись накопленных изменений сессий и выгрузка неактивных сессий из памяти"""
+        self.bot.sessions.maintain()
+
+    def start(self):
+        """Запуск пула и подготовка меню до приема сообщений"""
+        self.worker_pool.start()
+        self.bot.refresh_menu_views()
+
+    def shutdown(self):
+        """Остановка пула и запись сессий пользователей"""
+        self.worker_pool.shutdown()
+        self.bot.sessions.close()
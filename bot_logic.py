@@ -1,142 +1,173 @@
-import nltk
 import random
 import string
+import time
 from telegram import ReplyKeyboardMarkup
 
-from data_preparation import get_emo_dict, get_dialogues, get_menu, get_intent_dataset
-from nlp_functions import clean_text, lemmatize_text, extract_entities, analyze_sentiment, correct_text
-from intent_classifier import IntentClassifier, train_and_save_model
+from artifacts import load_artifacts
+from nlp_functions import (extract_entities, analyze_sentiment, normalize_text, get_menu_index, get_model,
+                           MENU_DATA_LOCK)
+from fuzzy_matching import has_close_match, find_nearest
+from session_store import create_session_store
+from recommender import MenuRecommender
+from rendering import MenuRenderer, add_cart_item, reset_cart, refresh_cart, render_cart
+from metrics import StageTimer, is_sampled, observe_stage_timings, MESSAGES_TOTAL, HANDLER_LATENCY
 
-from config import MODEL_FILE_PATH, INTENT_DATASET_FILE_PATH, MENU_FILE_PATH, DIALOGUES_FILE_PATH, EMO_DICT_FILE_PATH
+from config import (DIALOGUE_CANDIDATES_COUNT, INTENT_CONFIRMATION_MODE, INTENT_CONFIDENCE_THRESHOLD,
+                    SESSION_STORE_BACKEND, SESSION_DB_FILE_PATH, SESSION_TTL_SECONDS, SESSION_IDLE_SECONDS,
+                    SESSION_WRITE_BATCH_SIZE, SESSION_FLUSH_INTERVAL_SECONDS, ENTITY_INTENTS, ENTITY_NER_ENABLED,
+                    RECOMMENDATIONS_COUNT, MENU_PAGE_SIZE, MENU_PAGE_MAX_LENGTH)
 
-# Загрузка данных
-EMO_DICT = get_emo_dict(EMO_DICT_FILE_PATH)
-DIALOGUES = get_dialogues(DIALOGUES_FILE_PATH)
-MENU = get_menu(MENU_FILE_PATH)
-INTENT_DATASET = get_intent_dataset(INTENT_DATASET_FILE_PATH, MENU)
+# Загрузка данных и модели классификатора из кэша артефактов (при устаревшем кэше он пересобирается)
+ARTIFACTS = load_artifacts()
+EMO_DICT = ARTIFACTS["emo_dict"]
+DIALOGUES = ARTIFACTS["dialogue_index"]
+MENU = ARTIFACTS["menu"]
+INTENT_DATASET = ARTIFACTS["intent_dataset"]
+INTENT_EXAMPLES = ARTIFACTS["intent_examples"]
+INTENT_CLASSIFIER = ARTIFACTS["intent_classifier"]
 
-# Загрузка модели классификатора
-try:
-    INTENT_CLASSIFIER = IntentClassifier.load(MODEL_FILE_PATH)
-except FileNotFoundError:
-    print("Model not found, training new one...")
-    INTENT_CLASSIFIER = train_and_save_model(INTENT_DATASET_FILE_PATH, MODEL_FILE_PATH)
 
+def set_menu_data(menu, intent_dataset, intent_examples, intent_classifier=None):
+    """Замена данных, зависящих от меню, на заранее построенные (каждая структура заменяется целиком)"""
+    global MENU, INTENT_DATASET, INTENT_EXAMPLES, INTENT_CLASSIFIER
+    if intent_classifier is not None:
+        INTENT_CLASSIFIER = intent_classifier
+    INTENT_EXAMPLES = intent_examples
+    INTENT_DATASET = intent_dataset
+    MENU = menu
+
+
+def generate_response(text):
+    """Генерация ответа на основе датасета диалогов"""
+    prepared_text = normalize_text(text)
+
+    candidate_ids = DIALOGUES.get_candidates(prepared_text, DIALOGUE_CANDIDATES_COUNT, 0.2)
+    nearest = find_nearest(prepared_text, [DIALOGUES.questions[question_id] for question_id in candidate_ids], 0.2)
+
+    if nearest is not None:
+        return DIALOGUES.answers[candidate_ids[nearest[0]]]
 
-class RestaurantAssistantBot:
-    def __init__(self):
-        self.context = {}
-        self.carts = {}
-
-        self.menu_keyboard = ReplyKeyboardMarkup(
-            [
-                ["🛒 Корзина", "📋 Меню"],
-                ["❌ Очистить корзину", "✅ Оформить заказ"]
-            ],
-            resize_keyboard=True,
-            one_time_keyboard=False
-        )
-
-    def _get_user_cart(self, user_id):
-        """Получение корзины пользователя"""
-        if user_id not in self.carts:
-            self.carts[user_id] = []
-
-        return self.carts[user_id]
-
-    def _calculate_order_stats(self, cart):
-        """Вычисление средних параметров заказа"""
-        if len(cart) == 0:
-            return None
-
-        stats = {
-            'spiciness': 0.0,
-            'vegetarian': 0.0,
-            'saltiness': 0.0,
-            'sweetness': 0.0,
-            'count': len(cart)
-        }
-
-        for item in cart:
-            stats['spiciness'] += item['spiciness']
-            stats['vegetarian'] += item['vegetarian']
-            stats['saltiness'] += item['saltiness']
-            stats['sweetness'] += item['sweetness']
-
-        stats['spiciness'] /= stats['count']
-        stats['vegetarian'] /= stats['count']
-        stats['saltiness'] /= stats['count']
-        stats['sweetness'] /= stats['count']
-
-        return stats
-
-    def _find_recommendation(self, cart):
-        """Поиск блюда для рекомендации"""
-        if len(cart) == 0:
-            return None
-
-        order_stats = self._calculate_order_stats(cart)
-
-        if order_stats is None:
-            return None
-
-        best_match = None
-        best_score = -1
-
-        for item, item_data in MENU.items():
-            if any(cart_item['name_lower'] == item_data["name_lower"] for cart_item in cart):
-                continue
-
-            score = 0.0
-            score += 1.0 - abs(item_data['spiciness'] - order_stats['spiciness'])
-            score += 1.0 - abs(item_data['saltiness'] - order_stats['saltiness'])
-            score += 1.0 - abs(item_data['sweetness'] - order_stats['sweetness'])
-
-            # Штраф за невегетарианское блюдо в вегетарианском заказе
-            if order_stats['vegetarian'] > 0.5 and item_data['vegetarian'] < 0.5:
-                score -= 0.5
-
-            # Штраф за вегетарианское блюдо в невегетарианском заказе
-            if order_stats['vegetarian'] < 0.5 and item_data['vegetarian'] > 0.5:
-                score -= 0.15
-
-            # Штраф за основное блюдо после десерта
-            if order_stats['sweetness'] > 0.5 and item_data['sweetness'] < 0.3:
-                score -= 0.2
-
-            # Бонус за десерт после основного блюда
-            if order_stats['sweetness'] < 0.3 and item_data['sweetness'] > 0.7:
-                score += 0.2
-
-            if score > best_score:
-                best_score = score
-                best_match = item_data
-
-        return best_match
-
-    def _generate_response(self, text):
-        """Генерация ответа на основе датасета диалогов"""
-        prepared_text = lemmatize_text(correct_text(clean_text(text)))
-        words = set(prepared_text.split(" "))
-
-        mini_dataset = []
-        for word in words:
-            if word in DIALOGUES:
-                mini_dataset += DIALOGUES[word]
-
-        responses = []
-        for question, answer in mini_dataset:
-            prepared_question = lemmatize_text(correct_text(clean_text(question)))
 
-            if abs(len(prepared_text) - len(prepared_question)) / len(prepared_question) < 0.2:
-                distance = nltk.edit_distance(prepared_text, prepared_question)
-                weighted_distance = distance / len(prepared_question)
+def prepare_message(text):
+    """Нормализация текста сообщения"""
+    return normalize_text(text)
 
-                if weighted_distance < 0.2:
-                    responses.append([weighted_distance, question, answer])
 
-        if responses:
-            return min(responses, key=lambda x: x[0])[2]
+@MENU_DATA_LOCK.read()
+def analyze_message(text, prepared_text=None, prediction=None):
+    """Анализ сообщения без обращения к состоянию пользователей (может выполняться в отдельном потоке или процессе)
+
+    Нормализованный текст и предсказание классификатора (намерение и уверенность) могут быть переданы готовыми,
+    если они уже получены, например, пакетным предсказанием для нескольких сообщений.
+    """
+    # Время этапов замеряется только для выборки сообщений и передается вместе с результатом анализа
+    timings = {} if is_sampled() else None
+
+    if prepared_text is None:
+        with StageTimer(timings, "normalize"):
+            prepared_text = prepare_message(text)
+
+    with StageTimer(timings, "sentiment"):
+        sentiment = analyze_sentiment(prepared_text, EMO_DICT)
+
+    if prediction is None:
+        with StageTimer(timings, "intent_predict"):
+            labels, confidences = INTENT_CLASSIFIER.predict_batch([prepared_text])
+        prediction = (labels[0], confidences[0])
+    potential_intent, confidence = prediction
+
+    # Сущности нужны только обработчикам части намерений, поэтому для остальных они не извлекаются
+    entities = []
+    if potential_intent in ENTITY_INTENTS:
+        with StageTimer(timings, "entities"):
+            entities = extract_entities(prepared_text, ENTITY_NER_ENABLED)
+
+    intent = None
+    with StageTimer(timings, "intent_confirmation"):
+        if INTENT_CONFIRMATION_MODE == "confidence":
+            if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+                intent = potential_intent
+        elif has_close_match(prepared_text, INTENT_EXAMPLES[potential_intent], 0.5):
+            intent = potential_intent
+
+    generated_response = None
+    if intent is None:
+        with StageTimer(timings, "generate_response"):
+            generated_response = generate_response(text)
+
+    return {
+        "prepared_text": prepared_text,
+        "sentiment": sentiment,
+        "entities": entities,
+        "intent": intent,
+        "confidence": confidence,
+        "generated_response": generated_response,
+        "timings": timings
+    }
+
+
+def warm_up():
+    """Прогрев моделей и кэшей в рабочем процессе"""
+    analyze_message("привет")
+    # Модели сущностей загружаются отдельно, так как для приветствия сущности не извлекаются
+    extract_entities(next(iter(MENU)), ENTITY_NER_ENABLED)
+    # Общий словарь нужен для первого же слова вне словаря предметной области
+    get_model('spell_checker')
+
+
+# Клавиатура с основными действиями (одна для всех пользователей)
+MENU_KEYBOARD = ReplyKeyboardMarkup(
+    [
+        ["🛒 Корзина", "📋 Меню"],
+        ["❌ Очистить корзину", "✅ Оформить заказ"]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
+
+
+class RestaurantAssistantBot:
+    def __init__(self, session_store_backend=SESSION_STORE_BACKEND, session_db_file_path=SESSION_DB_FILE_PATH):
+        self.sessions = create_session_store(session_store_backend, session_db_file_path, SESSION_TTL_SECONDS,
+                                             SESSION_IDLE_SECONDS, SESSION_WRITE_BATCH_SIZE,
+                                             SESSION_FLUSH_INTERVAL_SECONDS)
+
+        self.menu_keyboard = MENU_KEYBOARD
+
+        self._recommender = None
+        self._menu_renderer = None
+
+    def _get_menu_renderer(self):
+        """Отрисованное меню для текущей версии меню (перерисовывается только при изменении меню)"""
+        menu_index = get_menu_index()
+        if self._menu_renderer is None or self._menu_renderer.version != menu_index.version:
+            self._menu_renderer = MenuRenderer(menu_index.menu, menu_index.version, MENU_PAGE_SIZE,
+                                               MENU_PAGE_MAX_LENGTH)
+        return self._menu_renderer
+
+    def refresh_menu_views(self):
+        """Подготовка отрисованного меню и модели рекомендаций для текущей версии меню заранее, до первого запроса"""
+        self._get_menu_renderer()
+        self._get_recommender()
+
+    def _get_cart_session(self, user_id):
+        """Сессия пользователя с корзиной, пересчитанной при изменении меню с момента ее отрисовки"""
+        session = self.sessions.get(user_id)
+        if refresh_cart(session, get_menu_index().menu, self._get_menu_renderer().token):
+            self.sessions.save(user_id)
+        return session
+
+    def _get_recommender(self):
+        """Модель рекомендаций для текущей версии меню (пересоздается при изменении меню)"""
+        menu_index = get_menu_index()
+        if self._recommender is None or self._recommender.version != menu_index.version:
+            self._recommender = MenuRecommender(menu_index.menu, menu_index.version)
+        return self._recommender
+
+    def _find_recommendations(self, dish_ids):
+        """Поиск блюд для рекомендации по заказу"""
+        menu = get_menu_index().menu
+        return [menu[dish_id] for dish_id in self._get_recommender().recommend(dish_ids, RECOMMENDATIONS_COUNT)]
 
     def _handle_greeting(self):
         """Обработка намерения приветствия"""
@@ -160,7 +191,6 @@ class RestaurantAssistantBot:
         responses = INTENT_DATASET["intents"]["cart_request"]["responses"]
         response = f"{random.choice(responses)}\n\n"
 
-        self._get_user_cart(user_id)
         cart_text = self.show_cart(user_id)
 
         response += cart_text
@@ -172,20 +202,14 @@ class RestaurantAssistantBot:
         responses = INTENT_DATASET["intents"]["order_request"]["responses"]
         response = f"{random.choice(responses)}\n\n"
 
-        possible_items = [entity["normal"] for entity in entities if entity["type"] == "MENU_ITEM"]
-        prepared_possible_items = [lemmatize_text(correct_text(clean_text(item))) for item in possible_items]
-
-        ordered_item = None
-        for item, item_data in MENU.items():
-            if lemmatize_text(correct_text(clean_text(item_data["name"]))) in prepared_possible_items:
-                ordered_item = (item, item_data)
-                break
+        dish_id = get_menu_index().resolve(entity["dish_id"] for entity in entities if entity["type"] == "MENU_ITEM")
 
-        if ordered_item is not None:
-            response += f"{ordered_item[1]["name"]} - {ordered_item[1]["price"]} руб.\n\n"
+        if dish_id is not None:
+            item_data = get_menu_index().menu[dish_id]
+            response += f"{item_data["name"]} - {item_data["price"]} руб.\n\n"
 
-            self._get_user_cart(user_id)
-            self.carts[user_id].append(MENU[ordered_item[0]])
+            add_cart_item(self._get_cart_session(user_id), dish_id, item_data, self._get_menu_renderer().token)
+            self.sessions.save(user_id)
 
             response += f"Товар добавлен в ваш заказ"
 
@@ -198,18 +222,12 @@ class RestaurantAssistantBot:
         responses = INTENT_DATASET["intents"]["price_request"]["responses"]
         response = f"{random.choice(responses)}\n\n"
 
-        possible_items = [entity["normal"] for entity in entities if entity["type"] == "MENU_ITEM"]
-        prepared_possible_items = [lemmatize_text(correct_text(clean_text(item))) for item in possible_items]
+        dish_id = get_menu_index().resolve(entity["dish_id"] for entity in entities if entity["type"] == "MENU_ITEM")
 
-        correct_item = None
-        for item, item_data in MENU.items():
-            if lemmatize_text(correct_text(clean_text(item_data["name"]))) in prepared_possible_items:
-                correct_item = (item, item_data)
-                break
-
-        if correct_item is not None:
-            response += f"{correct_item[1]["name"]} - {correct_item[1]["price"]} руб.\n"
-            response += f"{correct_item[1]["description"]}\n\n"
+        if dish_id is not None:
+            item_data = get_menu_index().menu[dish_id]
+            response += f"{item_data["name"]} - {item_data["price"]} руб.\n"
+            response += f"{item_data["description"]}\n\n"
             response += f"Если хотите заказать это - просто напишите об этом"
 
             return response
@@ -251,152 +269,128 @@ class RestaurantAssistantBot:
 
         return random.choice(responses)
 
-    def show_menu(self):
-        """Генерация текста меню"""
-        menu_text = "🍽 *Наше меню*:\n\n"
-        for item, details in MENU.items():
-            menu_text += f"*{details["name"]}*:\n"
-            menu_text += f"{details["description"]}\n"
-            menu_text += f"Цена: {details["price"]} руб.\n\n"
-        menu_text += "Если хотите что-то заказать, то напишите об этом"
-
-        return menu_text
+    @MENU_DATA_LOCK.read()
+    def show_menu(self, page=1):
+        """Текст страницы меню (отрисовывается один раз для каждой версии меню)"""
+        return self._get_menu_renderer().get_page(page)
 
+    @MENU_DATA_LOCK.read()
     def show_cart(self, user_id):
         """Генерация текста содержимого корзины"""
-        cart = self._get_user_cart(user_id)
+        session = self._get_cart_session(user_id)
 
-        if len(cart) == 0:
+        if len(session.cart) == 0:
             return "Ваша корзина пуста."
 
-        total = 0
-
-        cart_text = "🛒 *Ваша корзина*:\n\n"
-        for item in cart:
-            cart_text += f"• {item["name"]} - {item["price"]} руб.\n"
-            total += item["price"]
-        cart_text += f"\n*Итого: {total} руб.*"
-
-        return cart_text
+        return "🛒 *Ваша корзина*:\n\n" + render_cart(session)
 
     def clear_cart(self, user_id):
         """Очистка корзины"""
-        self.carts[user_id] = []
+        reset_cart(self.sessions.get(user_id))
+        self.sessions.save(user_id)
 
         return "Корзина очищена"
 
+    @MENU_DATA_LOCK.read()
     def complete_order(self, user_id):
         """Оформление заказа"""
-        cart = self._get_user_cart(user_id)
+        session = self._get_cart_session(user_id)
+        dish_ids = list(session.cart)
 
-        if len(cart) == 0:
+        if len(dish_ids) == 0:
             return "Ваша корзина пуста. Добавьте что-нибудь из меню."
 
-        total = 0
-
-        order_text = "✅ *Ваш заказ оформлен!*\n\n"
-        for item in cart:
-            order_text += f"• {item["name"]} - {item["price"]} руб.\n"
-            total += item["price"]
-        order_text += f"\n*Итого: {total} руб.*\n\n"
+        order_text = "✅ *Ваш заказ оформлен!*\n\n" + render_cart(session) + "\n\n"
         order_text += "Спасибо за заказ! Ожидайте подтверждения."
 
         self.clear_cart(user_id)
 
-        if self.context[user_id]["sentiment"] > 0.4 and self.context[user_id]["recommendation_counter"] > 10:
-            recommendation = self._find_recommendation(cart)
+        if session.sentiment > 0.4 and session.recommendation_counter > 10:
+            recommendations = self._find_recommendations(dish_ids)
 
-            if recommendation is not None:
+            if recommendations:
                 order_text += ("\n\nМы провели анализ на основе вашего заказа и думаем это может вам понравиться. "
                                "Вы можете заказать это прямо сейчас или когда посетите нас в следующий раз\n\n")
                 order_text += "🌟 *Рекомендуем попробовать*:\n"
-                order_text += f"{recommendation['name']} - {recommendation['price']} руб.\n"
-                order_text += recommendation['description']
+                order_text += "\n\n".join(f"{recommendation['name']} - {recommendation['price']} руб.\n"
+                                          f"{recommendation['description']}" for recommendation in recommendations)
+
+                session.recommendation_counter = 0
 
-                self.context[user_id]["recommendation_counter"] = 0
+        if session.sentiment >= 0:
+            session.coupon_counter += 1
 
-        if self.context[user_id]["sentiment"] >= 0:
-            self.context[user_id]["coupon_counter"] += 1
+        self.sessions.save(user_id)
 
         return order_text
 
     def handle_message(self, text, user_id):
         """Обработка сообщения"""
-        prepared_text = lemmatize_text(correct_text(clean_text(text)))
+        return self.handle_analysis(analyze_message(text), user_id)
 
-        sentiment = analyze_sentiment(prepared_text, EMO_DICT)
-        entities = extract_entities(prepared_text)
-        potential_intent = INTENT_CLASSIFIER.predict(prepared_text)
-
-        intent = None
-        for example in INTENT_DATASET["intents"][potential_intent]["examples"]:
-            prepared_example = lemmatize_text(correct_text(clean_text(example)))
-            distance = nltk.edit_distance(prepared_text, prepared_example)
-            if prepared_example and distance / len(prepared_example) <= 0.5:
-                intent = potential_intent
-                break
-
-        if user_id not in self.context:
-            self.context[user_id] = {
-                "last_intent": None,
-                "sentiment": 0,
-                "entities": [],
-                "recommendation_counter": 5,
-                "coupon_counter": 0,
-                "apologize_counter": 0
-            }
-
-        new_user_sentiment = (self.context[user_id]["sentiment"] + sentiment) / 2
+    @MENU_DATA_LOCK.read()
+    def handle_analysis(self, analysis, user_id):
+        """Обработка результатов анализа сообщения с обновлением состояния пользователя"""
+        sentiment = analysis["sentiment"]
+        entities = analysis["entities"]
+        intent = analysis["intent"]
+
+        session = self.sessions.get(user_id)
+
+        new_user_sentiment = (session.sentiment + sentiment) / 2
         if new_user_sentiment > 1:
             new_user_sentiment = 1
         elif new_user_sentiment < -1:
             new_user_sentiment = -1
 
-        new_user_recommendation_counter = self.context[user_id]["recommendation_counter"] + 1
+        session.last_intent = intent
+        session.sentiment = new_user_sentiment
+        session.entities = entities
+        session.recommendation_counter += 1
 
-        old_user_coupon_counter = self.context[user_id]["coupon_counter"]
-        old_user_apologize_counter = self.context[user_id]["apologize_counter"]
+        self.sessions.save(user_id)
 
-        self.context[user_id] = {
-            "last_intent": None,
-            "sentiment": new_user_sentiment,
-            "entities": entities,
-            "recommendation_counter": new_user_recommendation_counter,
-            "coupon_counter": old_user_coupon_counter,
-            "apologize_counter": old_user_apologize_counter
-        }
+        observe_stage_timings(analysis.get("timings"))
 
-        if intent is not None:
-            self.context[user_id]["last_intent"] = intent
+        handler_start = time.perf_counter()
+        response, handler_name = self._dispatch_intent(analysis, user_id)
+        if analysis.get("timings") is not None:
+            HANDLER_LATENCY.observe(time.perf_counter() - handler_start, handler_name)
+        MESSAGES_TOTAL.inc(handler_name)
+
+        return response
 
+    def _dispatch_intent(self, analysis, user_id):
+        """Вызов обработчика намерения; возвращает ответ и название сработавшего обработчика"""
+        entities = analysis["entities"]
+        intent = analysis["intent"]
+
+        if intent is not None:
             if intent == "greeting":
-                return self._handle_greeting()
+                return self._handle_greeting(), intent
             elif intent == "menu_request":
-                return self._handle_menu_request()
+                return self._handle_menu_request(), intent
             elif intent == "cart_request":
-                return self._handle_cart_request(user_id)
+                return self._handle_cart_request(user_id), intent
             elif intent == "order_request":
-                return self._handle_order_request(entities, user_id)
+                return self._handle_order_request(entities, user_id), intent
             elif intent == "price_request":
-                return self._handle_price_request(entities)
+                return self._handle_price_request(entities), intent
             elif intent == "complete_order_request":
-                return self._handle_complete_order_request(user_id)
+                return self._handle_complete_order_request(user_id), intent
             elif intent == "clear_cart_request":
-                return self._handle_clear_cart_request(user_id)
+                return self._handle_clear_cart_request(user_id), intent
             elif intent == "goodbye":
-                return self._handle_goodbye()
-        else:
-            response = self._generate_response(text)
+                return self._handle_goodbye(), intent
+        elif analysis["generated_response"] is not None:
+            return self._handle_generated_answer(analysis["generated_response"]), "generated_answer"
 
-            if response is not None:
-                return self._handle_generated_answer(response)
-
-        return self._handle_unknown()
+        return self._handle_unknown(), "unknown"
 
     def get_user_sentiment(self, user_id):
         """Получение настроения пользователя"""
 
-        return self.context[user_id]["sentiment"]
+        return self.sessions.get(user_id).sentiment
 
     def apologize(self, user_id):
         """Извинение перед пользователем"""
@@ -406,20 +400,40 @@ class RestaurantAssistantBot:
                          f"Также могу предложить вам купон \"SORRY10\", который дает 10% скидку при предъявлении "
                          f"его официанту в одном из наших заведений")
 
-        if self.context[user_id]["apologize_counter"] >= 3:
-            self.context[user_id]["apologize_counter"] = 0
+        session = self.sessions.get(user_id)
+
+        if session.apologize_counter >= 3:
+            session.apologize_counter = 0
+            self.sessions.save(user_id)
             return sorry_message
         else:
-            self.context[user_id]["apologize_counter"] += 1
+            session.apologize_counter += 1
+            self.sessions.save(user_id)
 
         return None
 
     def is_coupon_needed(self, user_id):
         """Купон на скидку пользователя"""
-        if self.context[user_id]["coupon_counter"] >= 5:
-            self.context[user_id]["coupon_counter"] = 0
+        session = self.sessions.get(user_id)
+
+        if session.coupon_counter >= 5:
+            session.coupon_counter = 0
+            self.sessions.save(user_id)
             coupon_message = (f"Вот ваш персональный купон на скидку: \n\n"
                               f"```{''.join(random.choice(string.ascii_letters + string.digits) for _ in range(8))}```\n\n"
                               f"Купон начнет действовать уже с завтрашнего дня, просто предъявите его официанту!")
             return True, coupon_message
         return False, None
+
+    def get_followup_messages(self, user_id):
+        """Дополнительные сообщения после ответа: извинение при негативном настрое или купон на скидку"""
+        coupon_flag, coupon_message = self.is_coupon_needed(user_id)
+
+        if self.get_user_sentiment(user_id) <= -0.75:
+            sorry_message = self.apologize(user_id)
+            if sorry_message is not None:
+                return [sorry_message]
+        elif coupon_flag:
+            return [coupon_message]
+
+        return []
@@ -1,9 +1,134 @@
-# Токен для бота
-TELEGRAM_TOKEN = "8128728486:AAGP1j8Wg_hiJ33tfhQW9i0MtCkB3uTJW6M"
+import os
+
+# Токен для бота (переменная окружения позволяет запустить бота с другим токеном, например для нагрузочного теста)
+TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN", "8128728486:AAGP1j8Wg_hiJ33tfhQW9i0MtCkB3uTJW6M")
+# Адрес сервера Bot API (None - серверы Telegram; для нагрузочного теста - локальный сервер-имитация)
+TELEGRAM_API_BASE_URL = os.environ.get("TELEGRAM_API_BASE_URL")
 
 # Пути к файлам
 DIALOGUES_FILE_PATH = "data/dialogues.txt"
 EMO_DICT_FILE_PATH = "data/kartaslovsent.csv"
 INTENT_DATASET_FILE_PATH = "data/intent_dataset.json"
 MENU_FILE_PATH = "data/menu.json"
-MODEL_FILE_PATH = "models/intent_classifier.pkl"
\ No newline at end of file
+MODEL_FILE_PATH = "models/intent_classifier.pkl"
+ARTIFACTS_FILE_PATH = "models/artifacts.pkl"
+COMPACT_MODEL_DIR_PATH = "models/intent_classifier_compact"
+TRAINING_REPORT_DIR_PATH = "models/training_report"
+
+# Фиксированное зерно генератора случайных чисел для воспроизводимого обучения классификатора
+TRAINING_RANDOM_SEED = 42
+
+# Формат модели классификатора при работе бота: "sklearn" (pickle конвейера) или "compact" (массивы NumPy)
+INTENT_MODEL_FORMAT = "compact"
+
+# Количество кандидатов из индекса диалогов, которые сравниваются с сообщением по расстоянию редактирования
+DIALOGUE_CANDIDATES_COUNT = 100
+
+# Способ подтверждения предсказанного намерения: "examples" - поиск близкого примера из датасета,
+# "confidence" - сравнение значения решающей функции классификатора с порогом
+INTENT_CONFIRMATION_MODE = "examples"
+INTENT_CONFIDENCE_THRESHOLD = 0.3
+
+# Объединение одновременных запросов к классификатору в один пакет в пределах короткого окна
+INTENT_MICRO_BATCHING = True
+INTENT_BATCH_WINDOW_SECONDS = 0.005
+INTENT_BATCH_MAX_SIZE = 64
+
+# Быстрый режим лемматизации только при помощи pymorphy2 (без морфологической разметки Natasha)
+LEMMATIZATION_FAST_MODE = False
+
+# Максимальное количество слов в кэше лемм
+LEMMA_CACHE_SIZE = 100000
+
+# Режим выполнения анализа сообщений вне цикла событий: "thread", "process" или None (в цикле событий)
+MESSAGE_EXECUTOR_MODE = "thread"
+MESSAGE_EXECUTOR_WORKERS = 4
+
+# Максимальное количество сообщений, ожидающих свободного исполнителя, и поведение при переполнении очереди:
+# "wait" - ждать освобождения места, "reject" - сразу отвечать пользователю, что бот перегружен
+MESSAGE_QUEUE_SIZE = 64
+MESSAGE_QUEUE_OVERFLOW_POLICY = "wait"
+
+# Хранилище сессий и корзин пользователей: "memory" или "sqlite"
+SESSION_STORE_BACKEND = "sqlite"
+# Переменная окружения позволяет записывать сессии в другой файл, например во временный при нагрузочном тесте
+SESSION_DB_FILE_PATH = os.environ.get("SESSION_DB_FILE_PATH", "models/sessions.sqlite3")
+# Сессии пользователей, неактивных дольше этого времени, удаляются
+SESSION_TTL_SECONDS = 30 * 24 * 60 * 60
+# Сессии, к которым не обращались дольше этого времени, выгружаются из памяти (в базе они хранятся до истечения TTL)
+SESSION_IDLE_SECONDS = 60 * 60
+# Изменения сессий записываются в базу пачками по количеству или по времени
+SESSION_WRITE_BATCH_SIZE = 100
+# С этим же интервалом бот записывает изменения, накопленные без новых сообщений, и выгружает неактивные сессии
+SESSION_FLUSH_INTERVAL_SECONDS = 5
+
+# Метрики: доля сообщений, для которых замеряется время этапов, и способ их публикации
+METRICS_SAMPLE_RATE = 0.1
+# Локальный HTTP-адрес для метрик в формате Prometheus (None или 0 в переменной окружения - не запускать сервер)
+METRICS_HTTP_HOST = "127.0.0.1"
+METRICS_HTTP_PORT = int(os.environ.get("METRICS_HTTP_PORT", 9100)) or None
+# Файл для периодической записи метрик (None - не записывать)
+METRICS_DUMP_FILE_PATH = None
+METRICS_DUMP_INTERVAL_SECONDS = 60
+
+# Журнал сообщений и ответов бота в формате JSON lines (пишется в фоновом потоке)
+EVENT_LOG_FILE_PATH = os.environ.get("EVENT_LOG_FILE_PATH", "logs/messages.jsonl")
+# Размер файла журнала, после которого выполняется ротация, и количество хранимых старых файлов
+EVENT_LOG_MAX_BYTES = 10 * 1024 * 1024
+EVENT_LOG_BACKUP_COUNT = 5
+# Доля записываемых сообщений
+EVENT_LOG_SAMPLE_RATE = 1.0
+# Записи пишутся в файл пакетами по количеству или по истечении интервала
+EVENT_LOG_BATCH_SIZE = 100
+EVENT_LOG_FLUSH_INTERVAL_SECONDS = 1.0
+
+# Исправление опечаток: размер кэша исправлений слов и максимальное расстояние редактирования
+SPELL_CACHE_SIZE = 100000
+SPELL_MAX_EDIT_DISTANCE = 2
+# Исправлять слова вне словаря предметной области по общему словарю pyspellchecker (заметно медленнее)
+SPELL_GENERAL_FALLBACK = False
+
+# Намерения, для обработки которых нужны сущности (для остальных сущности не извлекаются)
+ENTITY_INTENTS = ("order_request", "price_request")
+# Извлекать именованные сущности Natasha (имена, места, организации) помимо блюд меню
+ENTITY_NER_ENABLED = False
+# Минимальная длина слова названия блюда, учитываемого при предпроверке текста перед запуском парсера блюд
+MENU_TOKEN_MIN_LENGTH = 3
+
+# Количество блюд, рекомендуемых после оформления заказа
+RECOMMENDATIONS_COUNT = 3
+
+# Количество блюд на странице меню и максимальная длина страницы (ограничение Telegram - 4096 символов)
+MENU_PAGE_SIZE = 30
+MENU_PAGE_MAX_LENGTH = 4000
+
+# Отслеживание изменений файла меню с перестроением зависящих от него данных без перезапуска бота
+MENU_WATCH_ENABLED = True
+MENU_WATCH_INTERVAL_SECONDS = 5
+
+# Количество процессов-шардов, между которыми пользователи распределяются по хэшу user_id (0 - без шардов)
+SHARD_COUNT = 0
+# Адрес, на котором шарды принимают запросы (шард с номером i слушает порт SHARD_BASE_PORT + i)
+SHARD_HOST = "127.0.0.1"
+SHARD_BASE_PORT = 7100
+# Количество одновременно обрабатываемых обновлений в режиме шардов
+SHARD_CONCURRENT_UPDATES = 256
+
+# Способ получения обновлений: "polling" - опрос серверов Telegram, "webhook" - прием обновлений HTTP-сервером бота
+BOT_RUN_MODE = os.environ.get("BOT_RUN_MODE", "polling")
+# Адрес и путь, на которых бот принимает обновления в режиме вебхука
+WEBHOOK_LISTEN = "127.0.0.1"
+WEBHOOK_PORT = 8443
+WEBHOOK_URL_PATH = "telegram"
+# Публичный адрес, регистрируемый в Telegram как вебхук (None - не регистрировать, например при локальной проверке)
+WEBHOOK_URL = None
+# Секрет, который Telegram передает в заголовке каждого запроса к вебхуку (None - без проверки)
+WEBHOOK_SECRET_TOKEN = None
+# Количество одновременных соединений Telegram с вебхуком (от 1 до 100)
+WEBHOOK_MAX_CONNECTIONS = 40
+
+# Количество одновременно выполняемых обработчиков обновлений
+# (None - по размеру пула анализа сообщений или SHARD_CONCURRENT_UPDATES в режиме шардов)
+UPDATE_MAX_CONCURRENT = None
+# Количество принятых в обработку обновлений, включая ожидающие завершения предыдущих обновлений того же пользователя
+UPDATE_MAX_PENDING = 1024
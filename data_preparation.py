@@ -1,6 +1,7 @@
+import hashlib
 import json
 
-from nlp_functions import clean_text, lemmatize_text, correct_text
+from nlp_functions import normalize_text
 
 
 def get_emo_dict(file_path):
@@ -33,28 +34,14 @@ def get_dialogues(file_path):
             continue
 
         question, answer = dialogue
-        question = lemmatize_text(correct_text(clean_text(question[2:])))
+        question = normalize_text(question[2:])
         answer = answer[2:]
 
         if question != '' and question not in questions:
             questions.add(question)
             filtered_dialogues.append([question, answer])
 
-    structured_dialogues = {}
-
-    for question, answer in filtered_dialogues:
-        words = set(question.split(' '))
-        for word in words:
-            if word not in structured_dialogues:
-                structured_dialogues[word] = []
-            structured_dialogues[word].append([question, answer])
-
-    structured_dialogues_cut = {}
-    for word, pairs in structured_dialogues.items():
-        pairs.sort(key=lambda pair: len(pair[0]))
-        structured_dialogues_cut[word] = pairs[:1000]
-
-    return structured_dialogues_cut
+    return filtered_dialogues
 
 
 def get_menu(file_path):
@@ -84,3 +71,27 @@ def get_intent_dataset(file_path, menu):
         data["intents"][intent]["examples"] = examples
 
     return data
+
+
+def get_files_hash(*file_paths):
+    """Вычисление общего хэша содержимого нескольких файлов"""
+    hasher = hashlib.sha256()
+    for file_path in file_paths:
+        with open(file_path, "rb") as file:
+            hasher.update(file.read())
+    return hasher.hexdigest()
+
+
+def get_intent_examples(intent_dataset, normalizer=normalize_text):
+    """Нормализация примеров намерений для проверки предсказаний классификатора"""
+    intent_examples = {}
+    for intent, intent_data in intent_dataset["intents"].items():
+        prepared_examples = []
+        for example in intent_data["examples"]:
+            prepared_example = normalizer(example)
+            # Пустые примеры не участвуют в сравнении, а повторы не влияют на результат проверки
+            if prepared_example and prepared_example not in prepared_examples:
+                prepared_examples.append(prepared_example)
+        intent_examples[intent] = tuple(prepared_examples)
+
+    return intent_examples
@@ -0,0 +1,66 @@
+import math
+
+import numpy as np
+
+# Параметры ранжирования BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class DialogueIndex:
+    def __init__(self, dialogues, source_hash=None):
+        self.source_hash = source_hash
+        self.questions = [question for question, _ in dialogues]
+        self.answers = [answer for _, answer in dialogues]
+        self.lengths = np.array([len(question) for question in self.questions], dtype=np.int32)
+        self.postings = {}
+
+        self._build_postings()
+
+    def _build_postings(self):
+        """Построение инвертированного индекса с заранее посчитанными весами BM25"""
+        term_frequencies = []
+        raw_postings = {}
+        for question_id, question in enumerate(self.questions):
+            frequencies = {}
+            for term in question.split(' '):
+                frequencies[term] = frequencies.get(term, 0) + 1
+            term_frequencies.append(sum(frequencies.values()))
+            for term, frequency in frequencies.items():
+                raw_postings.setdefault(term, []).append((question_id, frequency))
+
+        documents_count = len(self.questions)
+        average_length = sum(term_frequencies) / documents_count if documents_count else 0.0
+
+        for term, postings in raw_postings.items():
+            idf = math.log(1 + (documents_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            ids = np.array([question_id for question_id, _ in postings], dtype=np.int32)
+            weights = np.empty(len(postings), dtype=np.float32)
+            for position, (question_id, frequency) in enumerate(postings):
+                length_norm = 1 - BM25_B + BM25_B * term_frequencies[question_id] / average_length
+                weights[position] = idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+            self.postings[term] = (ids, weights)
+
+    def get_candidates(self, text, top_k, length_ratio=None):
+        """Отбор top_k наиболее релевантных вопросов по BM25
+
+        Если задан length_ratio, вопросы с |len(text) - len(question)| / len(question) >= length_ratio
+        не участвуют в отборе. Идентификаторы возвращаются в порядке убывания релевантности.
+        """
+        scores = np.zeros(len(self.questions), dtype=np.float32)
+        for term in set(text.split(' ')):
+            if term in self.postings:
+                ids, weights = self.postings[term]
+                scores[ids] += weights
+
+        if length_ratio is not None:
+            scores[np.abs(len(text) - self.lengths) / self.lengths >= length_ratio] = 0
+
+        candidate_ids = np.flatnonzero(scores)
+        if len(candidate_ids) > top_k:
+            top_positions = np.argpartition(-scores[candidate_ids], top_k - 1)[:top_k]
+            candidate_ids = np.sort(candidate_ids[top_positions])
+
+        # Стабильная сортировка сохраняет порядок корпуса для вопросов с одинаковой релевантностью
+        order = np.argsort(-scores[candidate_ids], kind="stable")
+        return candidate_ids[order].tolist()
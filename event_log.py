@@ -0,0 +1,95 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+
+class AsyncJsonLogger:
+    def __init__(self, file_path, max_bytes, backup_count, sample_rate=1.0, batch_size=100, flush_interval=1.0):
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._thread = None
+
+    def log(self, event, **fields):
+        """Постановка записи в очередь; сериализация и запись выполняются в фоновом потоке"""
+        if self._thread is None:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return
+        fields["event"] = event
+        fields["time"] = time.time()
+        self._queue.put(fields)
+
+    def start(self):
+        """Запуск фонового потока записи"""
+        if self._thread is not None:
+            return
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.file_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._write_loop, name="event-log", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Запись оставшихся в очереди записей и остановка фонового потока"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        self._file = None
+
+    def _write_loop(self):
+        """Сбор записей в пакеты по размеру или по времени и их запись одним вызовом"""
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is None:
+                    running = False
+                    break
+                batch.append(record)
+
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        """Запись пакета строк JSON с ротацией файла при превышении размера"""
+        lines = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch)
+        self._file.write(lines)
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """Ротация файлов: log -> log.1 -> log.2 ... с удалением самого старого"""
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.file_path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.file_path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.file_path, f"{self.file_path}.1")
+        else:
+            os.remove(self.file_path)
+        self._file = open(self.file_path, "a", encoding="utf-8")
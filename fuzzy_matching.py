@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+
+# Начиная с этого количества кандидатов расстояния считаются векторизованно
+BATCH_MIN_CANDIDATES = 32
+
+
+def get_max_distance(length, ratio, strict=False):
+    """Максимальное расстояние, при котором отношение distance / length удовлетворяет порогу"""
+    max_distance = math.floor(length * ratio)
+    # Проверка тем же делением, что и при сравнении с порогом, чтобы избежать ошибок округления
+    while max_distance >= 0 and not _is_within_ratio(max_distance, length, ratio, strict):
+        max_distance -= 1
+    while _is_within_ratio(max_distance + 1, length, ratio, strict):
+        max_distance += 1
+    return max_distance
+
+
+def _is_within_ratio(distance, length, ratio, strict):
+    """Проверка отношения расстояния к длине на соответствие порогу"""
+    if strict:
+        return distance / length < ratio
+    return distance / length <= ratio
+
+
+def bounded_edit_distance(first, second, max_distance):
+    """Расстояние Левенштейна с ранним выходом, если оно превышает max_distance (тогда возвращается max_distance + 1)"""
+    if max_distance < 0:
+        return 0 if first == second else max_distance + 1
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    if len(first) < len(second):
+        first, second = second, first
+    if not second:
+        return len(first)
+
+    previous_row = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current_row = [i]
+        row_min = i
+        for j, second_char in enumerate(second, 1):
+            distance = min(previous_row[j] + 1,
+                           current_row[j - 1] + 1,
+                           previous_row[j - 1] + (first_char != second_char))
+            current_row.append(distance)
+            if distance < row_min:
+                row_min = distance
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_row = current_row
+
+    return min(previous_row[-1], max_distance + 1)
+
+
+def batch_edit_distance(text, candidates):
+    """Векторизованный расчет расстояний Левенштейна от текста до списка кандидатов"""
+    if not candidates:
+        return np.zeros(0, dtype=np.int32)
+
+    lengths = np.array([len(candidate) for candidate in candidates], dtype=np.int32)
+    max_length = int(lengths.max())
+
+    # Кандидаты кодируются матрицей кодов символов, хвосты дополняются значением -1
+    codes = np.full((len(candidates), max_length), -1, dtype=np.int32)
+    for row, candidate in enumerate(candidates):
+        codes[row, :len(candidate)] = [ord(char) for char in candidate]
+
+    previous_row = np.broadcast_to(np.arange(max_length + 1, dtype=np.int32),
+                                   (len(candidates), max_length + 1)).copy()
+    current_row = np.empty_like(previous_row)
+    for i, char in enumerate(text, 1):
+        cost = (codes != ord(char)).astype(np.int32)
+        current_row[:, 0] = i
+        substitution = previous_row[:, :-1] + cost
+        deletion = previous_row[:, 1:] + 1
+        np.minimum(substitution, deletion, out=current_row[:, 1:])
+        # Вставки зависят от соседней ячейки той же строки, поэтому идут последовательно по столбцам
+        for j in range(1, max_length + 1):
+            np.minimum(current_row[:, j], current_row[:, j - 1] + 1, out=current_row[:, j])
+        previous_row, current_row = current_row, previous_row
+
+    return previous_row[np.arange(len(candidates)), lengths]
+
+
+def has_close_match(text, candidates, ratio):
+    """Проверка наличия кандидата, для которого distance / len(candidate) <= ratio"""
+    for candidate in candidates:
+        if not candidate:
+            continue
+        max_distance = get_max_distance(len(candidate), ratio)
+        if bounded_edit_distance(text, candidate, max_distance) <= max_distance:
+            return True
+    return False
+
+
+def find_nearest(text, candidates, ratio):
+    """Поиск ближайшего кандидата со строгим порогом distance / len(candidate) < ratio
+
+    Кандидаты с непохожей длиной (|len(text) - len(candidate)| / len(candidate) >= ratio) отбрасываются сразу.
+    При равных расстояниях выбирается кандидат, встретившийся раньше. Возвращается индекс кандидата и
+    нормированное расстояние или None, если подходящих кандидатов нет.
+    """
+    text_length = len(text)
+    pruned = [(index, candidate) for index, candidate in enumerate(candidates)
+              if candidate and abs(text_length - len(candidate)) / len(candidate) < ratio]
+
+    if not pruned:
+        return None
+
+    if len(pruned) >= BATCH_MIN_CANDIDATES:
+        distances = batch_edit_distance(text, [candidate for _, candidate in pruned])
+        best = None
+        for (index, candidate), distance in zip(pruned, distances.tolist()):
+            weighted_distance = distance / len(candidate)
+            if weighted_distance < ratio and (best is None or weighted_distance < best[1]):
+                best = (index, weighted_distance)
+        return best
+
+    best = None
+    for index, candidate in pruned:
+        # Порог сужается по мере нахождения лучших кандидатов
+        bound = ratio if best is None else min(ratio, best[1])
+        max_distance = get_max_distance(len(candidate), bound, strict=True)
+        if max_distance < 0:
+            continue
+        distance = bounded_edit_distance(text, candidate, max_distance)
+        if distance <= max_distance:
+            best = (index, distance / len(candidate))
+    return best
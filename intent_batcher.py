@@ -0,0 +1,51 @@
+import asyncio
+
+
+class IntentMicroBatcher:
+    def __init__(self, classifier, window_seconds, max_batch_size, executor=None):
+        self.classifier = classifier
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.executor = executor
+        self._pending = []
+        self._flush_handle = None
+
+    async def predict(self, text):
+        """Предсказание намерения и уверенности; запросы, пришедшие в пределах окна, объединяются в один пакет"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Отправка накопленных запросов на пакетное предсказание"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._predict_batch(batch))
+
+    async def _predict_batch(self, batch):
+        """Пакетное предсказание вне цикла событий и передача результатов ожидающим запросам"""
+        loop = asyncio.get_running_loop()
+        texts = [text for text, _ in batch]
+
+        try:
+            labels, confidences = await loop.run_in_executor(self.executor, self.classifier.predict_batch, texts)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), label, confidence in zip(batch, labels, confidences):
+            if not future.done():
+                future.set_result((label, confidence))
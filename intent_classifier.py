@@ -1,7 +1,15 @@
+import json
+import os
 import pickle
+import re
+import tempfile
+import time
+from collections import Counter
+
 import numpy as np
+from scipy.sparse import csr_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, cross_validate, GridSearchCV, StratifiedKFold
 from sklearn.metrics import classification_report
 from sklearn.pipeline import Pipeline
 from sklearn.svm import LinearSVC
@@ -9,14 +17,20 @@ from sklearn.svm import LinearSVC
 from data_preparation import get_menu, get_intent_dataset
 from model_metrics_visualization import plot_confusion_matrix, plot_learning_curve
 
-from config import MENU_FILE_PATH
+from config import MENU_FILE_PATH, TRAINING_RANDOM_SEED
+
+# Сетка гиперпараметров для необязательного подбора
+PARAM_GRID = {
+    "tfidf__ngram_range": [(2, 3), (3, 3), (2, 4), (3, 5)],
+    "clf__C": [0.1, 0.5, 1.0, 5.0]
+}
 
 
 class IntentClassifier:
-    def __init__(self):
+    def __init__(self, ngram_range=(3, 3), C=1.0, random_state=TRAINING_RANDOM_SEED):
         self.pipeline = Pipeline([
-            ("tfidf", TfidfVectorizer(analyzer="char", ngram_range=(3, 3))),
-            ("clf", LinearSVC())
+            ("tfidf", TfidfVectorizer(analyzer="char", ngram_range=ngram_range, dtype=np.float32)),
+            ("clf", LinearSVC(C=C, random_state=random_state))
         ])
 
     def train(self, X, y):
@@ -27,10 +41,34 @@ class IntentClassifier:
         """Предсказание намерения для текста"""
         return self.pipeline.predict([text])[0]
 
+    def predict_batch(self, texts):
+        """Пакетное предсказание намерений с оценкой уверенности (значением решающей функции)"""
+        scores = self.pipeline.decision_function(texts)
+        classes = self.pipeline.classes_
+
+        if scores.ndim == 1:
+            labels = classes[(scores > 0).astype(int)]
+            confidences = np.abs(scores)
+        else:
+            best = scores.argmax(axis=1)
+            labels = classes[best]
+            confidences = scores[np.arange(len(texts)), best]
+
+        return labels.tolist(), confidences.tolist()
+
     def save(self, file_path):
-        """Сохранение модели в файл"""
-        with open(file_path, "wb") as file:
-            pickle.dump(self.pipeline, file)
+        """Атомарное сохранение модели в файл"""
+        dir_path = os.path.dirname(file_path)
+        os.makedirs(dir_path, exist_ok=True)
+        # Временный файл уникален для каждой записи: процессы шардов могут обучать модель одновременно
+        file_descriptor, temp_file_path = tempfile.mkstemp(dir=dir_path, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                pickle.dump(self.pipeline, file)
+            os.replace(temp_file_path, file_path)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
 
     @classmethod
     def load(cls, file_path):
@@ -41,6 +79,104 @@ class IntentClassifier:
         classifier.pipeline = pipeline
         return classifier
 
+    def export_compact(self, dir_path):
+        """Экспорт модели в набор массивов NumPy, не зависящий от версии sklearn"""
+        vectorizer = self.pipeline.named_steps["tfidf"]
+        clf = self.pipeline.named_steps["clf"]
+
+        # Словарь хранится отсортированным массивом, поэтому веса переставляются в том же порядке
+        terms = sorted(vectorizer.vocabulary_)
+        order = np.array([vectorizer.vocabulary_[term] for term in terms])
+
+        arrays = {
+            "vocabulary": np.array(terms),
+            "idf": vectorizer.idf_[order].astype(np.float64),
+            "coef": np.ascontiguousarray(clf.coef_[:, order].T),
+            "intercept": clf.intercept_,
+            "ngram_range": np.array(vectorizer.ngram_range),
+            # Классы записываются последними: по времени изменения этого файла определяется готовность экспорта
+            "classes": np.array(clf.classes_).astype(str)
+        }
+
+        os.makedirs(dir_path, exist_ok=True)
+        for name, array in arrays.items():
+            # Файлы заменяются атомарно, чтобы не повредить массивы, уже отображенные в память другими процессами
+            file_descriptor, temp_file_path = tempfile.mkstemp(dir=dir_path, suffix=".tmp.npy")
+            try:
+                with os.fdopen(file_descriptor, "wb") as file:
+                    np.save(file, array)
+                os.replace(temp_file_path, os.path.join(dir_path, f"{name}.npy"))
+            finally:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+
+
+class CompactIntentClassifier:
+    # Как и в TfidfVectorizer, подряд идущие пробельные символы заменяются одним пробелом
+    WHITE_SPACES = re.compile(r"\s\s+")
+
+    def __init__(self, vocabulary, idf, coef, intercept, classes, ngram_range):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+        self.classes = classes
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+
+    @classmethod
+    def load(cls, dir_path):
+        """Загрузка модели с отображением массивов в память"""
+        arrays = [np.load(os.path.join(dir_path, f"{name}.npy"), mmap_mode="r")
+                  for name in ("vocabulary", "idf", "coef", "intercept", "classes", "ngram_range")]
+        return cls(*arrays)
+
+    def _get_features(self, texts):
+        """Разреженная матрица TF-IDF признаков пакета текстов по символьным n-граммам (строки нормированы)"""
+        min_n, max_n = self.ngram_range
+        ngrams, counts, lengths = [], [], []
+        for text in texts:
+            text = self.WHITE_SPACES.sub(" ", text.lower())
+            text_counts = Counter(text[i:i + n] for n in range(min_n, max_n + 1) for i in range(len(text) - n + 1))
+            ngrams.extend(text_counts)
+            counts.extend(text_counts.values())
+            lengths.append(len(text_counts))
+
+        # Все n-граммы пакета ищутся в словаре одним вызовом
+        ngrams = np.array(ngrams, dtype=str)
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        positions = np.searchsorted(self.vocabulary, ngrams)
+        positions[positions == len(self.vocabulary)] = 0
+        known = self.vocabulary[positions] == ngrams if len(ngrams) else np.zeros(0, dtype=bool)
+
+        rows, positions = rows[known], positions[known]
+        values = np.array(counts, dtype=np.float64)[known] * self.idf[positions]
+        # Строки без известных n-грамм остаются нулевыми, и их оценка равна свободному члену
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(texts)))
+        values /= norms[rows]
+
+        return csr_matrix((values, (rows, positions)), shape=(len(texts), len(self.vocabulary)))
+
+    def predict(self, text):
+        """Предсказание намерения для текста"""
+        return self.predict_batch([text])[0][0]
+
+    def predict_batch(self, texts):
+        """Пакетное предсказание намерений с оценкой уверенности (значением решающей функции)"""
+        if not texts:
+            return [], []
+
+        scores = self._get_features(texts) @ self.coef + self.intercept
+
+        if scores.shape[1] == 1:
+            labels = self.classes[(scores[:, 0] > 0).astype(int)]
+            confidences = np.abs(scores[:, 0])
+        else:
+            best = scores.argmax(axis=1)
+            labels = self.classes[best]
+            confidences = scores[np.arange(len(texts)), best]
+
+        return labels.astype(str).tolist(), confidences.tolist()
+
 
 def prepare_intents_dataset_for_model(file_path):
     """Подготовка датасета намерений для модели"""
@@ -61,16 +197,42 @@ def prepare_intents_dataset_for_model(file_path):
     return X, y, classes
 
 
-def train_and_save_model(dataset_file_path, model_file_path):
-    """Обучение и сохранение модели, вывод различных метрик модели"""
-    X, y, classes = prepare_intents_dataset_for_model(dataset_file_path)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
+def train_and_save_model(dataset_file_path, model_file_path, seed=TRAINING_RANDOM_SEED, report_dir_path=None,
+                         cv_folds=5, n_jobs=-1, search=False, with_learning_curve=False):
+    """Обучение и сохранение модели; метрики, отчет и графики рассчитываются, только если задан report_dir_path"""
+    timings = {}
 
-    classifier = IntentClassifier()
-    classifier.train(X_train, y_train)
-    classifier.save(model_file_path)
+    def timed(name, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        timings[name] = time.perf_counter() - start
+        return result
 
-    y_pred = classifier.pipeline.predict(X_test)
+    X, y, classes = timed("prepare_dataset", prepare_intents_dataset_for_model, dataset_file_path)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=seed)
+    cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=seed)
+
+    params = {"ngram_range": (3, 3), "C": 1.0}
+    if search:
+        grid_search = GridSearchCV(IntentClassifier(random_state=seed).pipeline, PARAM_GRID, cv=cv,
+                                   scoring="f1_macro", n_jobs=n_jobs)
+        timed("hyperparameter_search", grid_search.fit, X_train, y_train)
+        params = {"ngram_range": grid_search.best_params_["tfidf__ngram_range"],
+                  "C": grid_search.best_params_["clf__C"]}
+        print(f"Лучшие параметры: {params}\n")
+
+    classifier = IntentClassifier(**params, random_state=seed)
+    timed("train", classifier.train, X_train, y_train)
+    timed("save", classifier.save, model_file_path)
+
+    # При обучении из бота (запуск без модели, перезагрузка меню) метрики не нужны: модель только обучается
+    if report_dir_path is None:
+        return classifier
+
+    cv_scores = timed("cross_validation", cross_validate, IntentClassifier(**params, random_state=seed).pipeline,
+                      X_train, y_train, cv=cv, scoring=["accuracy", "f1_macro"], n_jobs=n_jobs)
+
+    y_pred = timed("predict_test", classifier.pipeline.predict, X_test)
 
     accuracy = np.mean(y_pred == y_test)
     print(f"Точность : {accuracy:.4f}\n")
@@ -78,10 +240,32 @@ def train_and_save_model(dataset_file_path, model_file_path):
     print("Отчет по классам:")
     print(f"{classification_report(y_test, y_pred)}\n")
 
-    print("Матрица ошибок будет выведена на графике\n")
-    plot_confusion_matrix(y_test, y_pred)
+    os.makedirs(report_dir_path, exist_ok=True)
+
+    timed("plot_confusion_matrix", plot_confusion_matrix, y_test, y_pred,
+          os.path.join(report_dir_path, "confusion_matrix.png"))
+    if with_learning_curve:
+        timed("plot_learning_curve", plot_learning_curve, IntentClassifier(**params, random_state=seed).pipeline,
+              X, y, os.path.join(report_dir_path, "learning_curve.png"), cv, n_jobs)
+
+    metrics = {
+        "seed": seed,
+        "params": {"ngram_range": list(params["ngram_range"]), "C": params["C"]},
+        "train_size": len(X_train),
+        "test_size": len(X_test),
+        "accuracy": float(accuracy),
+        "cv_accuracy_mean": float(np.mean(cv_scores["test_accuracy"])),
+        "cv_accuracy_std": float(np.std(cv_scores["test_accuracy"])),
+        "cv_f1_macro_mean": float(np.mean(cv_scores["test_f1_macro"])),
+        "cv_f1_macro_std": float(np.std(cv_scores["test_f1_macro"])),
+        "classification_report": classification_report(y_test, y_pred, output_dict=True),
+        "timings": timings
+    }
+    with open(os.path.join(report_dir_path, "metrics.json"), "w", encoding="utf-8") as file:
+        json.dump(metrics, file, indent=2, ensure_ascii=False)
 
-    print("Кривая обучения также будет представлена на графике\n")
-    plot_learning_curve(classifier.pipeline, X, y)
+    print("Время этапов обучения:")
+    for name, seconds in timings.items():
+        print(f"  {name}: {seconds:.2f} с")
 
     return classifier
@@ -1,19 +1,88 @@
+import asyncio
+import contextlib
+import time
+
 from telegram import Update
 from telegram.ext import filters, MessageHandler, ApplicationBuilder, CommandHandler, ContextTypes
 
-from bot_logic import RestaurantAssistantBot
-
-from config import TELEGRAM_TOKEN
+from artifacts import get_startup_report
+from bot_backend import LocalBotBackend
+from event_log import AsyncJsonLogger
+from bot_logic import RestaurantAssistantBot, INTENT_CLASSIFIER, MENU_KEYBOARD
+import bot_logic
+from intent_batcher import IntentMicroBatcher
+from menu_watcher import MenuWatcher
+from metrics import REGISTRY
+from nlp_functions import get_lemma_cache_stats, get_spell_cache_stats
+from sharding import ShardRouter
+from update_processing import PerUserUpdateProcessor
+from webhook_server import WebhookServer
+from worker_pool import MessageWorkerPool, WorkerPoolOverloadedError
+
+from config import (TELEGRAM_TOKEN, MESSAGE_EXECUTOR_MODE, MESSAGE_EXECUTOR_WORKERS, MESSAGE_QUEUE_SIZE,
+                    MESSAGE_QUEUE_OVERFLOW_POLICY, INTENT_MICRO_BATCHING, INTENT_BATCH_WINDOW_SECONDS,
+                    INTENT_BATCH_MAX_SIZE, METRICS_HTTP_HOST, METRICS_HTTP_PORT, METRICS_DUMP_FILE_PATH,
+                    METRICS_DUMP_INTERVAL_SECONDS, EVENT_LOG_FILE_PATH, EVENT_LOG_MAX_BYTES, EVENT_LOG_BACKUP_COUNT,
+                    EVENT_LOG_SAMPLE_RATE, EVENT_LOG_BATCH_SIZE, EVENT_LOG_FLUSH_INTERVAL_SECONDS, MENU_WATCH_ENABLED,
+                    MENU_WATCH_INTERVAL_SECONDS, SHARD_COUNT, SHARD_HOST, SHARD_BASE_PORT, SESSION_STORE_BACKEND,
+                    SESSION_DB_FILE_PATH, SHARD_CONCURRENT_UPDATES, BOT_RUN_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT,
+                    WEBHOOK_URL_PATH, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS, UPDATE_MAX_CONCURRENT,
+                    UPDATE_MAX_PENDING, TELEGRAM_API_BASE_URL, SESSION_FLUSH_INTERVAL_SECONDS)
 
 # Инициализация бота
-bot = RestaurantAssistantBot()
-
+event_log = AsyncJsonLogger(EVENT_LOG_FILE_PATH, EVENT_LOG_MAX_BYTES, EVENT_LOG_BACKUP_COUNT, EVENT_LOG_SAMPLE_RATE,
+                            EVENT_LOG_BATCH_SIZE, EVENT_LOG_FLUSH_INTERVAL_SECONDS)
+
+# Запросы пользователей обрабатываются ботом в этом процессе или распределяются по шардам
+if SHARD_COUNT > 0:
+    # Бот, его сессии и пул анализа находятся в процессах шардов
+    bot = None
+    worker_pool = None
+    intent_batcher = None
+    backend = ShardRouter(SHARD_COUNT, SHARD_HOST, SHARD_BASE_PORT, SESSION_STORE_BACKEND, SESSION_DB_FILE_PATH)
+else:
+    bot = RestaurantAssistantBot()
+    worker_pool = MessageWorkerPool(MESSAGE_EXECUTOR_MODE, MESSAGE_EXECUTOR_WORKERS, MESSAGE_QUEUE_SIZE,
+                                    MESSAGE_QUEUE_OVERFLOW_POLICY)
+    intent_batcher = (IntentMicroBatcher(INTENT_CLASSIFIER, INTENT_BATCH_WINDOW_SECONDS, INTENT_BATCH_MAX_SIZE)
+                      if INTENT_MICRO_BATCHING else None)
+    backend = LocalBotBackend(bot, worker_pool, intent_batcher)
+
+
+def on_menu_reload():
+    """Обновление ссылок на замененные данные и подготовка меню после перезагрузки меню"""
+    if intent_batcher is not None:
+        intent_batcher.classifier = bot_logic.INTENT_CLASSIFIER
+    bot.refresh_menu_views()
+
+
+menu_watcher = MenuWatcher(MENU_WATCH_INTERVAL_SECONDS, retrain=True, on_reload=on_menu_reload)
+
+
+def get_cache_hit_rate(stats):
+    """Доля попаданий в кэш NLP функции (в режиме процессов - только для основного процесса)"""
+    lookups = stats['hits'] + stats['misses']
+    return stats['hits'] / lookups if lookups else 0.0
+
+
+# Метрики, вычисляемые в момент сбора (пул анализа есть только без шардов)
+if worker_pool is not None:
+    REGISTRY.gauge("bot_executor_queue_depth", "Количество запросов, ожидающих свободного исполнителя",
+                   lambda: worker_pool.queue_depth)
+    REGISTRY.gauge("bot_executor_pending_requests", "Количество запросов, находящихся в пуле анализа",
+                   lambda: worker_pool.pending)
+REGISTRY.gauge("bot_lemma_cache_hit_rate", "Доля попаданий в кэш лемм",
+               lambda: get_cache_hit_rate(get_lemma_cache_stats()))
+REGISTRY.gauge("bot_spell_cache_hit_rate", "Доля попаданий в кэш исправлений слов",
+               lambda: get_cache_hit_rate(get_spell_cache_stats()))
+REGISTRY.gauge("bot_spell_cache_size", "Количество слов в кэше исправлений",
+               lambda: get_spell_cache_stats()['size'])
 
 # Обработчики Telegram
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "Привет! Я бот для заказа обедов. Чем могу помочь?",
-        reply_markup=bot.menu_keyboard,
+        reply_markup=MENU_KEYBOARD,
         parse_mode='Markdown'
     )
 
@@ -21,15 +90,18 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "Я могу помочь с меню, оформлением заказа и информацией о работе ресторана. Просто напишите!",
-        reply_markup=bot.menu_keyboard,
+        reply_markup=MENU_KEYBOARD,
         parse_mode='Markdown'
     )
 
 
 async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Номер страницы передается аргументом команды: /menu 2
+    page = int(context.args[0]) if context.args and context.args[0].isdigit() else 1
+
     await update.message.reply_text(
-        bot.show_menu(),
-        reply_markup=bot.menu_keyboard,
+        await backend.show_menu(page),
+        reply_markup=MENU_KEYBOARD,
         parse_mode='Markdown'
     )
 
@@ -38,8 +110,8 @@ async def cart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.message.from_user.id)
 
     await update.message.reply_text(
-        bot.show_cart(user_id),
-        reply_markup=bot.menu_keyboard,
+        await backend.show_cart(user_id),
+        reply_markup=MENU_KEYBOARD,
         parse_mode='Markdown'
     )
 
@@ -48,8 +120,8 @@ async def clear_cart_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = str(update.message.from_user.id)
 
     await update.message.reply_text(
-        bot.clear_cart(user_id),
-        reply_markup=bot.menu_keyboard,
+        await backend.clear_cart(user_id),
+        reply_markup=MENU_KEYBOARD,
         parse_mode='Markdown'
     )
 
@@ -58,8 +130,8 @@ async def complete_order_command(update: Update, context: ContextTypes.DEFAULT_T
     user_id = str(update.message.from_user.id)
 
     await update.message.reply_text(
-        bot.complete_order(user_id),
-        reply_markup=bot.menu_keyboard,
+        await backend.complete_order(user_id),
+        reply_markup=MENU_KEYBOARD,
         parse_mode='Markdown'
     )
 
@@ -67,62 +139,113 @@ async def complete_order_command(update: Update, context: ContextTypes.DEFAULT_T
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.message.from_user.id)
     user_name = update.effective_user.username
+    start = time.perf_counter()
 
     text = update.message.text
 
     if text == "📋 Меню":
         await menu_command(update, context)
 
-        print(f"Пользователь ({user_id} - {user_name}): нажал кнопку \"меню\"")
+        event_log.log("button", user_id=user_id, user_name=user_name, button="menu",
+                      latency_ms=(time.perf_counter() - start) * 1000)
 
     elif text == "🛒 Корзина":
         await cart_command(update, context)
 
-        print(f"Пользователь ({user_id} - {user_name}): нажал кнопку \"корзина\"")
+        event_log.log("button", user_id=user_id, user_name=user_name, button="cart",
+                      latency_ms=(time.perf_counter() - start) * 1000)
 
     elif text == "❌ Очистить корзину":
         await clear_cart_command(update, context)
 
-        print(f"Пользователь ({user_id} - {user_name}): нажал кнопку \"очистить корзину\"")
+        event_log.log("button", user_id=user_id, user_name=user_name, button="clear_cart",
+                      latency_ms=(time.perf_counter() - start) * 1000)
 
     elif text == "✅ Оформить заказ":
         await complete_order_command(update, context)
 
-        print(f"Пользователь ({user_id} - {user_name}): нажал кнопку \"оформить заказ\"")
+        event_log.log("button", user_id=user_id, user_name=user_name, button="complete_order",
+                      latency_ms=(time.perf_counter() - start) * 1000)
 
     else:
-        response = bot.handle_message(text, user_id)
+        try:
+            result = await backend.process_message(text, user_id)
+        except WorkerPoolOverloadedError:
+            await update.message.reply_text(
+                "Сейчас у меня очень много сообщений, попробуйте написать чуть позже",
+                reply_markup=MENU_KEYBOARD,
+                parse_mode='Markdown'
+            )
+            return
+
+        response = result["response"]
 
         await update.message.reply_text(
             response,
-            reply_markup=bot.menu_keyboard,
+            reply_markup=MENU_KEYBOARD,
             parse_mode='Markdown'
         )
 
-        print(f"Сообщение пользователя ({user_id} - {user_name}): {text}")
-        print(f"Ответ бота: {response}")
-        print()
-
-    coupon_flag, coupon_message = bot.is_coupon_needed(user_id)
+        event_log.log("message", user_id=user_id, user_name=user_name, text=text, intent=result["intent"],
+                      confidence=result["confidence"], latency_ms=(time.perf_counter() - start) * 1000,
+                      response=response)
 
-    if bot.get_user_sentiment(user_id) <= -0.75:
-        sorry_message = bot.apologize(user_id)
-        if sorry_message is not None:
-            await update.message.reply_text(
-                sorry_message,
-                reply_markup=bot.menu_keyboard,
-                parse_mode='Markdown'
-            )
-    elif coupon_flag:
+    # Извинение при негативном настрое пользователя или купон на скидку
+    for followup_message in await backend.get_followup_messages(user_id):
         await update.message.reply_text(
-            coupon_message,
-            reply_markup=bot.menu_keyboard,
+            followup_message,
+            reply_markup=MENU_KEYBOARD,
             parse_mode='Markdown'
         )
 
 
-def main():
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+async def maintain_sessions():
+    """Периодическое обслуживание сессий: изменения без новых сообщений тоже записываются в базу"""
+    while True:
+        await asyncio.sleep(SESSION_FLUSH_INTERVAL_SECONDS)
+        await backend.maintain_sessions()
+
+
+async def start_session_maintenance(app):
+    """Запуск обслуживания сессий в цикле событий приложения, где выполняются и обработчики"""
+    app.bot_data["session_maintenance"] = asyncio.create_task(maintain_sessions())
+
+
+async def stop_session_maintenance(app):
+    """Остановка обслуживания сессий (оставшиеся изменения записываются при остановке бота)"""
+    task = app.bot_data.pop("session_maintenance", None)
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+def get_max_concurrent_updates():
+    """Количество одновременно выполняемых обработчиков обновлений"""
+    if UPDATE_MAX_CONCURRENT is not None:
+        return UPDATE_MAX_CONCURRENT
+    if SHARD_COUNT > 0:
+        return SHARD_CONCURRENT_UPDATES
+    # Без пула анализ выполняется в цикле событий, и одновременная обработка обновлений не ускоряет ответы
+    return worker_pool.capacity if worker_pool.executor is not None else 1
+
+
+def build_application(request=None):
+    """Приложение Telegram с обработчиками (request заменяет отправку запросов к Bot API, например при проверке)"""
+    # Обновления разных пользователей обрабатываются одновременно, обновления одного пользователя - строго по очереди
+    update_processor = PerUserUpdateProcessor(get_max_concurrent_updates(), UPDATE_MAX_PENDING)
+    # В режиме опроса обслуживание сессий запускается и останавливается вместе с приложением
+    builder = (ApplicationBuilder().token(TELEGRAM_TOKEN).concurrent_updates(update_processor)
+               .post_init(start_session_maintenance).post_stop(stop_session_maintenance))
+    if request is not None:
+        builder = builder.request(request)
+    if TELEGRAM_API_BASE_URL is not None:
+        base_url = TELEGRAM_API_BASE_URL.rstrip("/")
+        builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+    if BOT_RUN_MODE == "webhook":
+        # Обновления поступают на HTTP-сервер бота, опрос серверов Telegram не нужен
+        builder = builder.updater(None)
+    app = builder.build()
 
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", help_command))
@@ -133,9 +256,60 @@ def main():
 
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
+    return app
+
+
+async def run_webhook(app):
+    """Прием обновлений HTTP-сервером бота до остановки процесса"""
+    webhook_server = WebhookServer(app, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_URL_PATH, WEBHOOK_SECRET_TOKEN)
+
+    async with app:
+        if WEBHOOK_URL is not None:
+            await app.bot.set_webhook(f"{WEBHOOK_URL.rstrip('/')}{webhook_server.url_path}",
+                                      secret_token=WEBHOOK_SECRET_TOKEN, max_connections=WEBHOOK_MAX_CONNECTIONS,
+                                      allowed_updates=Update.ALL_TYPES)
+        await app.start()
+        await start_session_maintenance(app)
+        await webhook_server.start()
+        print(f"Вебхук принимает обновления на http://{WEBHOOK_LISTEN}:{webhook_server.port}{webhook_server.url_path}")
+
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await webhook_server.stop()
+            await stop_session_maintenance(app)
+            await app.stop()
+
+
+def main():
+    backend.start()
+    event_log.start()
+    # В режиме шардов меню отслеживает каждый шард сам
+    if MENU_WATCH_ENABLED and SHARD_COUNT == 0:
+        menu_watcher.start()
+    print(get_startup_report())
+
+    if METRICS_HTTP_PORT is not None:
+        REGISTRY.start_http_server(METRICS_HTTP_HOST, METRICS_HTTP_PORT)
+        print(f"Метрики доступны по адресу http://{METRICS_HTTP_HOST}:{METRICS_HTTP_PORT}/metrics")
+    if METRICS_DUMP_FILE_PATH is not None:
+        REGISTRY.start_file_dump(METRICS_DUMP_FILE_PATH, METRICS_DUMP_INTERVAL_SECONDS)
+
+    app = build_application()
+
     print("Бот запущен и ожидает сообщений пользователей...")
 
-    app.run_polling()
+    try:
+        if BOT_RUN_MODE == "webhook":
+            # Остановка по Ctrl+C, как и при опросе серверов Telegram
+            with contextlib.suppress(KeyboardInterrupt):
+                asyncio.run(run_webhook(app))
+        else:
+            app.run_polling()
+    finally:
+        menu_watcher.stop()
+        backend.shutdown()
+        event_log.close()
 
 
 if __name__ == '__main__':
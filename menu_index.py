@@ -0,0 +1,99 @@
+import json
+import os
+
+from fuzzy_matching import find_nearest
+
+# Поля блюда, из которых строятся варианты его названия
+ALIAS_FIELDS = ("name", "name_lower", "name_normal")
+
+
+class MenuIndex:
+    def __init__(self, file_path, normalizer):
+        self.file_path = file_path
+        self.normalizer = normalizer
+        self.menu = {}
+        self.positions = {}
+        self.names = {}
+        self.version = 0
+        self._dish_aliases = {}
+        self._mtime = None
+
+        self.refresh()
+
+    @staticmethod
+    def _get_aliases(dish_id, dish_data, normalizer):
+        """Варианты названия блюда: исходные и нормализованные"""
+        raw_aliases = {dish_id.lower()}
+        for field in ALIAS_FIELDS:
+            if dish_data.get(field):
+                raw_aliases.add(dish_data[field].lower())
+        return raw_aliases | {normalizer(alias) for alias in raw_aliases}
+
+    def refresh(self, normalizer=None):
+        """Перестроение индекса при изменении файла меню (нормализуются только новые и измененные блюда)"""
+        mtime = os.stat(self.file_path).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            menu = json.load(file)
+        self.update(menu, normalizer)
+        self._mtime = mtime
+
+        return True
+
+    def update(self, menu, normalizer=None):
+        """Инкрементальное обновление индекса по новому содержимому меню"""
+        # Другой нормализатор нужен при перестроении с новым словарем исправлений, еще не установленным как текущий
+        normalizer = normalizer or self.normalizer
+        dish_aliases = {}
+        for dish_id, dish_data in menu.items():
+            old_dish_data = self.menu.get(dish_id)
+            if old_dish_data is not None and all(old_dish_data.get(field) == dish_data.get(field)
+                                                 for field in ALIAS_FIELDS):
+                dish_aliases[dish_id] = self._dish_aliases[dish_id]
+            else:
+                dish_aliases[dish_id] = self._get_aliases(dish_id, dish_data, normalizer)
+
+        names = {}
+        for dish_id, aliases in dish_aliases.items():
+            for alias in aliases:
+                # При совпадении вариантов названия приоритет у блюда, стоящего в меню раньше
+                if alias and alias not in names:
+                    names[alias] = dish_id
+
+        # Замена всех структур целиком, чтобы читатели не видели промежуточного состояния
+        self.menu = menu
+        self.positions = {dish_id: position for position, dish_id in enumerate(menu)}
+        self.names = names
+        self._dish_aliases = dish_aliases
+        self.version += 1
+
+    def lookup(self, text, fuzzy=True):
+        """Поиск идентификатора блюда по названию: точное совпадение, затем нормализация и нечеткий поиск"""
+        names = self.names
+
+        dish_id = names.get(text.lower())
+        if dish_id is not None:
+            return dish_id
+
+        prepared_text = self.normalizer(text)
+        dish_id = names.get(prepared_text)
+        if dish_id is not None or not fuzzy:
+            return dish_id
+
+        aliases = list(names)
+        nearest = find_nearest(prepared_text, aliases, 0.2)
+        if nearest is not None:
+            return names[aliases[nearest[0]]]
+
+        return None
+
+    def resolve(self, dish_ids):
+        """Выбор блюда из найденных в тексте; при нескольких совпадениях - первое по порядку в меню"""
+        # Анализ мог выполняться в другом процессе по предыдущей версии меню, поэтому удаленные блюда отбрасываются
+        dish_ids = [dish_id for dish_id in dish_ids if dish_id in self.menu]
+        if not dish_ids:
+            return None
+
+        return min(dish_ids, key=self.positions.__getitem__)
@@ -0,0 +1,144 @@
+import copy
+import functools
+import os
+import threading
+import time
+import traceback
+from types import MappingProxyType
+
+import bot_logic
+from data_preparation import get_intent_dataset, get_intent_examples
+from intent_classifier import IntentClassifier, CompactIntentClassifier, train_and_save_model
+from nlp_functions import (build_menu_parser, build_menu_tokens, get_menu_index, swap_menu_models, clean_text,
+                           normalize_text, MENU_DATA_LOCK)
+from spell_correction import SymSpellCorrector, get_domain_vocabulary
+
+from config import (MENU_FILE_PATH, INTENT_DATASET_FILE_PATH, DIALOGUES_FILE_PATH, MODEL_FILE_PATH,
+                    COMPACT_MODEL_DIR_PATH, INTENT_MODEL_FORMAT, SPELL_MAX_EDIT_DISTANCE)
+
+
+def get_classifier_file_path():
+    """Файл, изменение которого означает появление новой модели классификатора в используемом формате"""
+    if INTENT_MODEL_FORMAT == "compact":
+        # При экспорте компактной модели файл классов записывается последним
+        return os.path.join(COMPACT_MODEL_DIR_PATH, "classes.npy")
+    return MODEL_FILE_PATH
+
+
+def load_current_classifier():
+    """Загрузка модели классификатора в используемом формате"""
+    if INTENT_MODEL_FORMAT == "compact":
+        return CompactIntentClassifier.load(COMPACT_MODEL_DIR_PATH)
+    return IntentClassifier.load(MODEL_FILE_PATH)
+
+
+def _get_mtime(file_path):
+    """Время изменения файла (None, если файла нет)"""
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class MenuWatcher:
+    def __init__(self, interval_seconds, retrain=True, on_reload=None):
+        self.interval_seconds = interval_seconds
+        # Переобучать классификатор должен только один процесс, остальные подхватывают новую модель из файла
+        self.retrain = retrain
+        self.on_reload = on_reload
+        self._menu_mtime = _get_mtime(MENU_FILE_PATH)
+        self._classifier_mtime = _get_mtime(get_classifier_file_path())
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Запуск фонового потока, проверяющего файлы меню и модели"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch_loop, name="menu-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановка фонового потока"""
+        self._stopped.set()
+
+    def _watch_loop(self):
+        """Периодическая проверка файлов; ошибка перестроения не останавливает бота, он работает со старыми данными"""
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+
+    def check(self):
+        """Проверка изменений файлов меню и модели с перестроением зависящих от них данных"""
+        with self._lock:
+            menu_mtime = _get_mtime(MENU_FILE_PATH)
+            if menu_mtime is not None and menu_mtime != self._menu_mtime:
+                self._reload_menu()
+                self._menu_mtime = menu_mtime
+                return True
+
+            classifier_mtime = _get_mtime(get_classifier_file_path())
+            if classifier_mtime is not None and classifier_mtime != self._classifier_mtime:
+                self._swap_classifier(load_current_classifier())
+                return True
+
+            return False
+
+    def _reload_menu(self):
+        """Построение всех зависящих от меню структур в фоне и их замена после того, как все готово"""
+        start = time.perf_counter()
+
+        domain_spell_checker = SymSpellCorrector(
+            get_domain_vocabulary(MENU_FILE_PATH, INTENT_DATASET_FILE_PATH, DIALOGUES_FILE_PATH, clean_text),
+            SPELL_MAX_EDIT_DISTANCE
+        )
+        # Новые названия блюд и примеры намерений нормализуются по новому словарю исправлений, который
+        # устанавливается вместе с остальными структурами
+        normalizer = functools.partial(normalize_text, domain_spell_checker=domain_spell_checker)
+
+        # Копия индекса перестраивается инкрементально, а текущий индекс продолжает обслуживать сообщения
+        menu_index = copy.copy(get_menu_index())
+        menu_index.refresh(normalizer)
+        menu = menu_index.menu
+        old_menu = bot_logic.MENU
+
+        models = {
+            'domain_spell_checker': domain_spell_checker,
+            'menu_parser': build_menu_parser(menu),
+            'menu_tokens': build_menu_tokens(menu)
+        }
+        intent_dataset = get_intent_dataset(INTENT_DATASET_FILE_PATH, menu)
+        intent_examples = MappingProxyType(get_intent_examples(intent_dataset, normalizer))
+
+        # Примеры намерений с названиями блюд меняются только при изменении набора блюд
+        intent_classifier = None
+        if self.retrain and set(menu) != set(old_menu):
+            model = train_and_save_model(INTENT_DATASET_FILE_PATH, MODEL_FILE_PATH)
+            if INTENT_MODEL_FORMAT == "compact":
+                model.export_compact(COMPACT_MODEL_DIR_PATH)
+            intent_classifier = load_current_classifier()
+            self._classifier_mtime = _get_mtime(get_classifier_file_path())
+
+        # Данные бота и инструменты NLP заменяются вместе, чтобы сообщение не увидело новое меню со старым парсером
+        with MENU_DATA_LOCK.write():
+            bot_logic.set_menu_data(menu, intent_dataset, intent_examples, intent_classifier)
+            swap_menu_models(models, menu_index)
+
+        if self.on_reload is not None:
+            self.on_reload()
+
+        print(f"Меню обновлено за {time.perf_counter() - start:.1f} с "
+              f"(блюд: {len(menu)}, модель переобучена: {'да' if intent_classifier is not None else 'нет'})")
+
+    def _swap_classifier(self, intent_classifier):
+        """Замена модели классификатора, обновленной другим процессом"""
+        with MENU_DATA_LOCK.write():
+            bot_logic.set_menu_data(bot_logic.MENU, bot_logic.INTENT_DATASET, bot_logic.INTENT_EXAMPLES,
+                                    intent_classifier)
+        self._classifier_mtime = _get_mtime(get_classifier_file_path())
+
+        if self.on_reload is not None:
+            self.on_reload()
@@ -0,0 +1,196 @@
+import bisect
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_SAMPLE_RATE
+
+# Границы корзин гистограмм задержек в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(label_name, label_value, extra=""):
+    """Форматирование меток метрики в синтаксисе Prometheus"""
+    labels = []
+    if label_name is not None:
+        labels.append(f'{label_name}="{label_value}"')
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, label_name=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value=None, amount=1):
+        """Увеличение счетчика"""
+        with self._lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def collect(self):
+        """Строки метрики в текстовом формате Prometheus"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_value, value in self.values.items():
+                lines.append(f"{self.name}{_format_labels(self.label_name, label_value)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, function, label_name=None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.label_name = label_name
+
+    def collect(self):
+        """Строки метрики в текстовом формате Prometheus; значение вычисляется в момент сбора"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        value = self.function()
+        values = value if isinstance(value, dict) else {None: value}
+        for label_value, item_value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_name, label_value)} {item_value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_name=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value=None):
+        """Учет одного наблюдения"""
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self.values.get(label_value)
+            if state is None:
+                state = self.values[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self):
+        """Строки метрики в текстовом формате Prometheus"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, (bucket_counts, total, count) in self.values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.label_name, label_value, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_name, label_value)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        """Регистрация метрики (повторная регистрация возвращает уже существующую)"""
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, label_name=None):
+        return self._register(Counter(name, documentation, label_name))
+
+    def histogram(self, name, documentation, label_name=None, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, label_name, buckets))
+
+    def gauge(self, name, documentation, function, label_name=None):
+        return self._register(Gauge(name, documentation, function, label_name))
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, host, port):
+        """Запуск локального HTTP-сервера, отдающего метрики по адресу /metrics"""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def start_file_dump(self, file_path, interval_seconds):
+        """Периодическая запись метрик в файл в фоновом потоке"""
+        def dump_loop():
+            while True:
+                time.sleep(interval_seconds)
+                temp_file_path = f"{file_path}.tmp"
+                with open(temp_file_path, "w", encoding="utf-8") as file:
+                    file.write(self.render())
+                os.replace(temp_file_path, file_path)
+
+        threading.Thread(target=dump_loop, name="metrics-dump", daemon=True).start()
+
+
+class StageTimer:
+    __slots__ = ("timings", "stage", "start")
+
+    def __init__(self, timings, stage):
+        self.timings = timings
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self):
+        if self.timings is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.timings is not None:
+            self.timings[self.stage] = time.perf_counter() - self.start
+
+
+def is_sampled():
+    """Решение о замере времени для текущего сообщения (замеряется только доля сообщений)"""
+    return random.random() < METRICS_SAMPLE_RATE
+
+
+REGISTRY = MetricsRegistry()
+
+MESSAGES_TOTAL = REGISTRY.counter("bot_messages_total", "Количество обработанных сообщений по намерениям", "intent")
+STAGE_LATENCY = REGISTRY.histogram("bot_stage_latency_seconds",
+                                   "Время этапов анализа сообщения (по выборке сообщений)", "stage")
+HANDLER_LATENCY = REGISTRY.histogram("bot_handler_latency_seconds",
+                                     "Время обработчиков намерений (по выборке сообщений)", "intent")
+
+
+def observe_stage_timings(timings):
+    """Учет времени этапов, замеренного при анализе сообщения (возможно, в другом процессе)"""
+    if timings:
+        for stage, seconds in timings.items():
+            STAGE_LATENCY.observe(seconds, stage)
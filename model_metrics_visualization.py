@@ -5,33 +5,34 @@ from sklearn.model_selection import learning_curve
 from sklearn.metrics import confusion_matrix
 
 
-def plot_confusion_matrix(y_true, y_pred):
+def _show_or_save(file_path):
+    """Вывод графика на экран или его сохранение в файл"""
+    if file_path is None:
+        plt.show()
+    else:
+        plt.savefig(file_path, bbox_inches="tight")
+        plt.close()
+
+
+def plot_confusion_matrix(y_true, y_pred, file_path=None):
     """Вывод матрицы ошибок"""
-    classes = ["cart_request",
-               "clear_cart_request",
-               "complete_order_request",
-               "goodbye",
-               "greeting",
-               "menu_request",
-               "order_request",
-               "price_request"]
+    classes = sorted(set(y_true) | set(y_pred))
 
-    cm = confusion_matrix(y_true, y_pred)
+    cm = confusion_matrix(y_true, y_pred, labels=classes)
 
     plt.figure(figsize=(12, 12))
-    plt.figure()
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
                 xticklabels=classes, yticklabels=classes)
     plt.xlabel('Предсказанный класс')
     plt.ylabel('Действительный класс')
     plt.title('Матрица ошибок')
-    plt.show()
+    _show_or_save(file_path)
 
 
-def plot_learning_curve(estimator, X, y):
+def plot_learning_curve(estimator, X, y, file_path=None, cv=5, n_jobs=-1):
     """Вывод графика кривой обучения"""
     train_sizes, train_scores, test_scores = learning_curve(
-        estimator, X, y, cv=5, n_jobs=-1,
+        estimator, X, y, cv=cv, n_jobs=n_jobs,
         train_sizes=np.linspace(.1, 1.0, 5))
 
     plt.figure()
@@ -41,4 +42,4 @@ def plot_learning_curve(estimator, X, y):
     plt.ylabel("Точность")
     plt.legend()
     plt.title("Кривая обучения")
-    plt.show()
+    _show_or_save(file_path)
@@ -1,32 +1,171 @@
 import json
 import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 
 from spellchecker import SpellChecker
 import pymorphy2
-from natasha import Segmenter, MorphVocab, NewsEmbedding, NewsMorphTagger, NewsSyntaxParser, NewsNERTagger, Doc
+from natasha import Segmenter, MorphVocab, NewsEmbedding, NewsMorphTagger, NewsNERTagger, Doc
 from yargy import Parser
 from yargy.pipelines import morph_pipeline
 from yargy.interpretation import fact
 
-from config import MENU_FILE_PATH
+from menu_index import MenuIndex
+from spell_correction import SymSpellCorrector, get_domain_vocabulary
 
-# Инициализация NLP инструментов
-embedding = NewsEmbedding()
-morph_analyzer = pymorphy2.MorphAnalyzer()
-morph_vocab = MorphVocab()
-segmenter = Segmenter()
-spell_checker = SpellChecker(language='ru')
-morph_tagger = NewsMorphTagger(embedding)
-ner_tagger = NewsNERTagger(embedding)
-syntax_parser = NewsSyntaxParser(embedding)
+from config import (MENU_FILE_PATH, INTENT_DATASET_FILE_PATH, DIALOGUES_FILE_PATH, LEMMATIZATION_FAST_MODE,
+                    LEMMA_CACHE_SIZE, SPELL_CACHE_SIZE, SPELL_MAX_EDIT_DISTANCE, SPELL_GENERAL_FALLBACK,
+                    MENU_TOKEN_MIN_LENGTH)
 
-# Подготовка для определения сущностей
-with open(MENU_FILE_PATH, "r", encoding="utf-8") as file:
-    data = json.load(file)
-MENU_DISHES = list(data.keys())
-menu_item = fact('MenuItem', ['name'])
-menu_rule = morph_pipeline(MENU_DISHES).interpretation(menu_item.name).interpretation(menu_item)
-menu_parser = Parser(menu_rule)
+
+def read_menu_file():
+    """Считывание файла меню"""
+    with open(MENU_FILE_PATH, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def build_menu_parser(menu=None):
+    """Подготовка парсера для определения блюд меню в тексте"""
+    data = menu if menu is not None else read_menu_file()
+    menu_dishes = list(data.keys())
+    menu_item = fact('MenuItem', ['name'])
+    menu_rule = morph_pipeline(menu_dishes).interpretation(menu_item.name).interpretation(menu_item)
+    return Parser(menu_rule)
+
+
+def build_menu_tokens(menu=None):
+    """Подготовка множества слов из названий блюд (исходных и лемматизированных) для быстрой предпроверки текста"""
+    data = menu if menu is not None else read_menu_file()
+    menu_tokens = set()
+    for dish_id, dish_data in data.items():
+        for name in (dish_id, dish_data.get("name", "")):
+            for token in clean_text(name).split():
+                for part in {token, *token.split('-')}:
+                    # Короткие слова (предлоги, союзы) встречаются почти в любом тексте и не отличают блюда
+                    if len(part) >= MENU_TOKEN_MIN_LENGTH:
+                        menu_tokens.add(part)
+                        menu_tokens.add(lemmatize_word(part))
+    return frozenset(menu_tokens)
+
+
+# Инициализация NLP инструментов выполняется лениво, при первом обращении к каждому из них
+MODEL_FACTORIES = {
+    'embedding': NewsEmbedding,
+    'morph_analyzer': pymorphy2.MorphAnalyzer,
+    'morph_vocab': MorphVocab,
+    'segmenter': Segmenter,
+    'spell_checker': lambda: SpellChecker(language='ru'),
+    'domain_spell_checker': lambda: SymSpellCorrector(
+        get_domain_vocabulary(MENU_FILE_PATH, INTENT_DATASET_FILE_PATH, DIALOGUES_FILE_PATH, clean_text),
+        SPELL_MAX_EDIT_DISTANCE
+    ),
+    'morph_tagger': lambda: NewsMorphTagger(get_model('embedding')),
+    'ner_tagger': lambda: NewsNERTagger(get_model('embedding')),
+    'menu_parser': build_menu_parser,
+    'menu_tokens': build_menu_tokens
+}
+MODEL_LOAD_TIMINGS = {}
+
+
+
+class MenuDataLock:
+    """Блокировка данных, зависящих от меню: сообщения обрабатываются параллельно, а замена данных после
+    обновления меню выполняется целиком, пока ни одно сообщение не обрабатывается"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        """Совместный доступ на время обработки сообщения (повторный вход в том же потоке не ждет замены)"""
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._condition:
+                # Ожидающая замена пропускается вперед новых сообщений, иначе под нагрузкой она не дождется очереди
+                while self._writing or self._waiting_writers:
+                    self._condition.wait()
+                self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                with self._condition:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Монопольный доступ для замены данных"""
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+# Общая блокировка для обработки сообщений и замены всех зависящих от меню структур (в том числе в bot_logic)
+MENU_DATA_LOCK = MenuDataLock()
+
+_models = {}
+_models_lock = threading.RLock()
+_menu_index = None
+
+
+def get_model(name):
+    """Получение NLP инструмента с загрузкой при первом обращении"""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _models_lock:
+        if name not in _models:
+            start = time.perf_counter()
+            _models[name] = MODEL_FACTORIES[name]()
+            MODEL_LOAD_TIMINGS[name] = time.perf_counter() - start
+        return _models[name]
+
+
+def get_menu_index():
+    """Индекс названий блюд, общий для извлечения сущностей и обработчиков заказа и цены"""
+    global _menu_index
+    if _menu_index is None:
+        with _models_lock:
+            if _menu_index is None:
+                _menu_index = MenuIndex(MENU_FILE_PATH, normalize_text)
+    return _menu_index
+
+
+def set_menu_index(menu_index):
+    """Установка готового индекса названий блюд (например, загруженного из кэша артефактов)"""
+    global _menu_index
+    _menu_index = menu_index
+
+
+def swap_menu_models(models, menu_index):
+    """Одновременная замена зависящих от меню инструментов и индекса блюд на заранее построенные"""
+    global _menu_index
+    with _models_lock:
+        _models.update(models)
+        _menu_index = menu_index
+        # Исправления слов зависят от словаря предметной области, в который входят названия блюд
+        if 'domain_spell_checker' in models:
+            correct_word.cache_clear()
 
 
 def clean_text(text):
@@ -39,56 +178,152 @@ def clean_text(text):
     return cleaned_text
 
 
-def correct_text(text):
-    """Исправление опечаток в тексте"""
+def correct_text(text, domain_spell_checker=None):
+    """Исправление опечаток в тексте (domain_spell_checker - словарь, еще не установленный в качестве текущего)"""
     words = text.split()
-    corrected_words = [spell_checker.correction(word) if word in spell_checker else word for word in words]
+    if domain_spell_checker is None:
+        corrected_words = [correct_word(word) for word in words]
+    else:
+        corrected_words = [_correct_word(word, domain_spell_checker) for word in words]
     corrected_text = ' '.join(corrected_words)
     return corrected_text
 
 
-def lemmatize_text(text):
-    """Лемматизация текста"""
+@lru_cache(maxsize=SPELL_CACHE_SIZE)
+def correct_word(word):
+    """Исправление опечатки в слове по текущему словарю предметной области с кэшированием результата"""
+    return _correct_word(word, get_model('domain_spell_checker'))
+
+
+def _correct_word(word, domain_spell_checker):
+    """Исправление опечатки в слове, неизвестном общему словарю, по словарю предметной области"""
+    if any(char.isdigit() for char in word):
+        return word
+
+    if word in domain_spell_checker:
+        return word
+
+    # Слова общего словаря (машина, бесит, доставка) не опечатки и не заменяются похожими словами меню
+    spell_checker = get_model('spell_checker')
+    if word in spell_checker:
+        return word
+
+    correction = domain_spell_checker.correction(word)
+    if correction is not None:
+        return correction
+
+    if SPELL_GENERAL_FALLBACK:
+        return spell_checker.correction(word) or word
+    return word
+
+
+def has_menu_tokens(text):
+    """Быстрая предпроверка: есть ли в тексте слова из названий блюд (без запуска парсера)"""
+    menu_tokens = get_model('menu_tokens')
+    return any(token in menu_tokens or lemmatize_word(token) in menu_tokens for token in clean_text(text).split())
+
+
+def analyze(text, lemmas=True, entities=False, fast=LEMMATIZATION_FAST_MODE, ner=True):
+    """Разбор текста за одно построение Doc: токены, а также леммы и сущности, если они запрошены
+
+    Именованные сущности (имена, места, организации) извлекаются только при ner=True, а парсер блюд меню
+    запускается только если в тексте встречаются слова из их названий.
+    """
     doc = Doc(text)
-    doc.segment(segmenter)
-    doc.tag_morph(morph_tagger)
-    doc.parse_syntax(syntax_parser)
-    for token in doc.tokens:
-        token.lemmatize(morph_vocab)
-    return ' '.join([token.lemma for token in doc.tokens])
+    doc.segment(get_model('segmenter'))
+
+    result = {'tokens': [token.text for token in doc.tokens]}
+
+    if lemmas:
+        if fast:
+            result['lemmas'] = [lemmatize_word(token.text, True) for token in doc.tokens]
+        else:
+            doc.tag_morph(get_model('morph_tagger'))
+            morph_vocab = get_model('morph_vocab')
+            for token in doc.tokens:
+                token.lemmatize(morph_vocab)
+            result['lemmas'] = [token.lemma for token in doc.tokens]
+
+    if entities:
+        result['entities'] = []
+        if ner:
+            doc.tag_ner(get_model('ner_tagger'))
+            morph_vocab = get_model('morph_vocab')
+            for span in doc.spans:
+                span.normalize(morph_vocab)
+                result['entities'].append({
+                    'type': span.type,
+                    'text': span.text,
+                    'normal': span.normal
+                })
+        if has_menu_tokens(text):
+            for match in get_model('menu_parser').findall(text):
+                result['entities'].append({
+                    'type': 'MENU_ITEM',
+                    'text': match.fact.name,
+                    'normal': match.fact.name.lower(),
+                    'dish_id': get_menu_index().lookup(match.fact.name)
+                })
+
+    return result
 
 
-def extract_entities(text):
+def lemmatize_text(text, fast=LEMMATIZATION_FAST_MODE):
+    """Лемматизация текста"""
+    return ' '.join(analyze(text, fast=fast)['lemmas'])
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize_word(word, fast=LEMMATIZATION_FAST_MODE):
+    """Лемматизация отдельного слова с кэшированием результата"""
+    if fast:
+        return get_model('morph_analyzer').parse(word)[0].normal_form
+    return lemmatize_text(word, False)
+
+
+def get_lemma_cache_stats():
+    """Статистика попаданий в кэш лемм"""
+    cache_info = lemmatize_word.cache_info()
+    return {
+        'hits': cache_info.hits,
+        'misses': cache_info.misses,
+        'size': cache_info.currsize,
+        'max_size': cache_info.maxsize
+    }
+
+
+def get_spell_cache_stats():
+    """Статистика попаданий в кэш исправлений слов (сбрасывается при обновлении словаря предметной области)"""
+    cache_info = correct_word.cache_info()
+    return {
+        'hits': cache_info.hits,
+        'misses': cache_info.misses,
+        'size': cache_info.currsize,
+        'max_size': cache_info.maxsize
+    }
+
+
+def normalize_text(text, domain_spell_checker=None):
+    """Полная нормализация текста: очистка, исправление опечаток и лемматизация"""
+    return lemmatize_text(correct_text(clean_text(text), domain_spell_checker))
+
+
+def extract_entities(text, ner=True):
     """Извлечение сущностей"""
-    doc = Doc(text)
-    doc.segment(segmenter)
-    doc.tag_ner(ner_tagger)
-    entities = []
-    for span in doc.spans:
-        span.normalize(morph_vocab)
-        entities.append({
-            'type': span.type,
-            'text': span.text,
-            'normal': span.normal
-        })
-    for match in menu_parser.findall(text):
-        entities.append({
-            'type': 'MENU_ITEM',
-            'text': match.fact.name,
-            'normal': match.fact.name.lower()
-        })
-    return entities
+    # Без именованных сущностей и без слов из названий блюд разбор текста не нужен
+    if not ner and not has_menu_tokens(text):
+        return []
+    return analyze(text, lemmas=False, entities=True, ner=ner)['entities']
 
 
 def analyze_sentiment(text, emo_dict):
     """Анализ тональности текста"""
-    words = text.split()
     sentiment_score = 0
     matched_words = 0
-    for word in words:
-        lemma = lemmatize_text(word)
-        if lemma in emo_dict:
-            sentiment_score += emo_dict[lemma]
+    for word in text.split():
+        value = emo_dict.get(lemmatize_word(word))
+        if value is not None:
+            sentiment_score += value
             matched_words += 1
     if matched_words > 0:
         return sentiment_score / matched_words
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Параметры блюд, из которых строится профиль заказа
+FEATURES = ("spiciness", "vegetarian", "saltiness", "sweetness")
+SPICINESS, VEGETARIAN, SALTINESS, SWEETNESS = range(len(FEATURES))
+
+
+class MenuRecommender:
+    def __init__(self, menu, version=None):
+        self.version = version
+        self.dish_ids = list(menu)
+        self.positions = {dish_id: position for position, dish_id in enumerate(self.dish_ids)}
+        self.features = np.array([[menu[dish_id][feature] for feature in FEATURES] for dish_id in self.dish_ids],
+                                 dtype=np.float64).reshape(len(self.dish_ids), len(FEATURES))
+
+    def get_order_profile(self, dish_ids):
+        """Средние параметры блюд заказа (None для пустого заказа)"""
+        positions = [self.positions[dish_id] for dish_id in dish_ids if dish_id in self.positions]
+        if not positions:
+            return None
+        return self.features[positions].mean(axis=0)
+
+    def get_scores(self, profile):
+        """Оценки всех блюд меню относительно профиля заказа"""
+        features = self.features
+
+        scores = ((1.0 - np.abs(features[:, SPICINESS] - profile[SPICINESS]))
+                  + (1.0 - np.abs(features[:, SALTINESS] - profile[SALTINESS]))
+                  + (1.0 - np.abs(features[:, SWEETNESS] - profile[SWEETNESS])))
+
+        # Штраф за невегетарианское блюдо в вегетарианском заказе
+        if profile[VEGETARIAN] > 0.5:
+            scores -= 0.5 * (features[:, VEGETARIAN] < 0.5)
+
+        # Штраф за вегетарианское блюдо в невегетарианском заказе
+        if profile[VEGETARIAN] < 0.5:
+            scores -= 0.15 * (features[:, VEGETARIAN] > 0.5)
+
+        # Штраф за основное блюдо после десерта
+        if profile[SWEETNESS] > 0.5:
+            scores -= 0.2 * (features[:, SWEETNESS] < 0.3)
+
+        # Бонус за десерт после основного блюда
+        if profile[SWEETNESS] < 0.3:
+            scores += 0.2 * (features[:, SWEETNESS] > 0.7)
+
+        return scores
+
+    def recommend(self, dish_ids, top_k=1):
+        """Блюда для рекомендации по заказу: top_k лучших по оценке, кроме уже заказанных (при равенстве - по меню)"""
+        profile = self.get_order_profile(dish_ids)
+        if profile is None:
+            return []
+
+        scores = self.get_scores(profile)
+        ordered_positions = [self.positions[dish_id] for dish_id in dish_ids if dish_id in self.positions]
+        scores[ordered_positions] = -np.inf
+
+        available_count = len(self.dish_ids) - len(set(ordered_positions))
+        top_k = min(top_k, available_count)
+        if top_k <= 0:
+            return []
+
+        if top_k < len(scores):
+            # Граница отбора включает все блюда с оценкой, равной k-й, чтобы порядок при равенстве был как в меню
+            threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(len(scores))
+        order = np.lexsort((candidates, -scores[candidates]))[:top_k]
+
+        return [self.dish_ids[position] for position in candidates[order]]
@@ -0,0 +1,98 @@
+import hashlib
+import json
+
+MENU_FOOTER = "Если хотите что-то заказать, то напишите об этом"
+
+
+def get_menu_token(menu):
+    """Отпечаток содержимого меню, по которому проверяется актуальность отрисованных строк корзин"""
+    content = json.dumps(menu, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(content).hexdigest()
+
+
+def render_dish(dish_data):
+    """Текст блюда в меню"""
+    return (f"*{dish_data['name']}*:\n"
+            f"{dish_data['description']}\n"
+            f"Цена: {dish_data['price']} руб.\n\n")
+
+
+def render_cart_line(dish_data):
+    """Строка блюда в корзине и в оформленном заказе"""
+    return f"• {dish_data['name']} - {dish_data['price']} руб.\n"
+
+
+class MenuRenderer:
+    def __init__(self, menu, version=None, page_size=30, max_page_length=4000):
+        self.version = version
+        self.token = get_menu_token(menu)
+        self.pages = self._render_pages(menu, page_size, max_page_length)
+
+    @staticmethod
+    def _render_pages(menu, page_size, max_page_length):
+        """Разбиение меню на страницы по количеству блюд и длине текста с отрисовкой каждой страницы"""
+        chunks = []
+        chunk = []
+        chunk_length = 0
+        for dish_data in menu.values():
+            dish_text = render_dish(dish_data)
+            if chunk and (len(chunk) >= page_size or chunk_length + len(dish_text) > max_page_length):
+                chunks.append(chunk)
+                chunk, chunk_length = [], 0
+            chunk.append(dish_text)
+            chunk_length += len(dish_text)
+        chunks.append(chunk)
+
+        if len(chunks) == 1:
+            return ["🍽 *Наше меню*:\n\n" + "".join(chunks[0]) + MENU_FOOTER]
+
+        pages = []
+        for number, chunk in enumerate(chunks, 1):
+            header = f"🍽 *Наше меню* (страница {number} из {len(chunks)}):\n\n"
+            if number < len(chunks):
+                footer = f"Следующая страница: /menu {number + 1}"
+            else:
+                footer = MENU_FOOTER
+            pages.append(header + "".join(chunk) + footer)
+        return pages
+
+    def get_page(self, number=1):
+        """Готовый текст страницы меню (номер вне диапазона приводится к ближайшей странице)"""
+        number = min(max(number, 1), len(self.pages))
+        return self.pages[number - 1]
+
+
+def add_cart_item(session, dish_id, dish_data, menu_token):
+    """Добавление блюда в корзину с обновлением итоговой суммы и отрисованных строк за O(1)"""
+    session.cart.append(dish_id)
+    session.cart_total += dish_data["price"]
+    session.cart_lines.append(render_cart_line(dish_data))
+    session.cart_menu_token = menu_token
+
+
+def reset_cart(session):
+    """Очистка корзины вместе с итоговой суммой и отрисованными строками"""
+    session.cart = []
+    session.cart_total = 0
+    session.cart_lines = []
+    session.cart_menu_token = None
+
+
+def refresh_cart(session, menu, menu_token):
+    """Пересчет итоговой суммы и строк корзины, если они отрисованы по другой версии меню
+
+    Возвращает True, если сессия изменилась. Блюда, удаленные из меню, убираются из корзины.
+    """
+    if session.cart_menu_token == menu_token or not session.cart:
+        return False
+
+    dish_ids = [dish_id for dish_id in session.cart if dish_id in menu]
+    reset_cart(session)
+    for dish_id in dish_ids:
+        add_cart_item(session, dish_id, menu[dish_id], menu_token)
+    return True
+
+
+def render_cart(session):
+    """Текст позиций корзины с итоговой суммой"""
+    return "".join(session.cart_lines) + f"\n*Итого: {session.cart_total} руб.*"
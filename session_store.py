@@ -0,0 +1,218 @@
+import json
+import os
+import sqlite3
+import time
+
+
+class UserSession:
+    __slots__ = ("last_intent", "sentiment", "entities", "recommendation_counter", "coupon_counter",
+                 "apologize_counter", "cart", "cart_total", "cart_lines", "cart_menu_token", "last_seen")
+
+    def __init__(self, last_intent=None, sentiment=0, entities=None, recommendation_counter=5, coupon_counter=0,
+                 apologize_counter=0, cart=None, cart_total=0, cart_lines=None, cart_menu_token=None, last_seen=None):
+        self.last_intent = last_intent
+        self.sentiment = sentiment
+        self.entities = entities if entities is not None else []
+        self.recommendation_counter = recommendation_counter
+        self.coupon_counter = coupon_counter
+        self.apologize_counter = apologize_counter
+        # В корзине хранятся только идентификаторы блюд (ключи меню)
+        self.cart = cart if cart is not None else []
+        # Итоговая сумма и отрисованные строки корзины обновляются при каждом изменении корзины
+        self.cart_total = cart_total
+        self.cart_lines = cart_lines if cart_lines is not None else []
+        # Отпечаток меню, по которому отрисованы строки (при изменении меню корзина пересчитывается)
+        self.cart_menu_token = cart_menu_token
+        self.last_seen = last_seen if last_seen is not None else time.time()
+
+    def to_dict(self):
+        """Преобразование сессии в словарь для сохранения"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстановление сессии из словаря"""
+        return cls(**data)
+
+
+class MemorySessionStore:
+    def __init__(self, ttl_seconds, eviction_interval_seconds=60):
+        self.ttl_seconds = ttl_seconds
+        self.eviction_interval_seconds = eviction_interval_seconds
+        self.sessions = {}
+        self._last_eviction = time.time()
+
+    def get(self, user_id):
+        """Получение сессии пользователя (создается при первом обращении)"""
+        self._evict_if_needed()
+
+        session = self.sessions.get(user_id)
+        if session is None:
+            session = self._load(user_id)
+            self.sessions[user_id] = session
+        session.last_seen = time.time()
+
+        return session
+
+    def save(self, user_id):
+        """Отметка об изменении сессии пользователя"""
+        pass
+
+    def flush(self):
+        """Запись накопленных изменений"""
+        pass
+
+    def maintain(self):
+        """Периодическое обслуживание: запись изменений, накопленных без новых сохранений, и удаление старых сессий"""
+        self.flush()
+        self._evict_if_needed()
+
+    def user_ids(self):
+        """Идентификаторы всех пользователей, сессии которых есть в хранилище"""
+        return list(self.sessions)
+
+    def pop(self, user_id):
+        """Удаление сессии пользователя из хранилища (например, при переносе в другой шард); None, если ее нет"""
+        return self.sessions.pop(user_id, None)
+
+    def put(self, user_id, session):
+        """Добавление готовой сессии пользователя (например, перенесенной из другого шарда)"""
+        self.sessions[user_id] = session
+        self.save(user_id)
+
+    def close(self):
+        """Завершение работы хранилища"""
+        self.flush()
+
+    def _load(self, user_id):
+        """Загрузка сессии, отсутствующей в памяти"""
+        return UserSession()
+
+    def _evict_if_needed(self):
+        """Периодическое удаление сессий пользователей, неактивных дольше ttl_seconds"""
+        now = time.time()
+        if now - self._last_eviction < self.eviction_interval_seconds:
+            return
+        self._last_eviction = now
+        self._evict(now)
+
+    def _evict(self, now):
+        """Удаление сессий, время хранения которых истекло"""
+        self.evict_idle(now - self.ttl_seconds)
+
+    def evict_idle(self, threshold):
+        """Удаление сессий, к которым не обращались с момента threshold"""
+        idle_user_ids = [user_id for user_id, session in self.sessions.items() if session.last_seen < threshold]
+        for user_id in idle_user_ids:
+            del self.sessions[user_id]
+
+
+class SqliteSessionStore(MemorySessionStore):
+    def __init__(self, file_path, ttl_seconds, idle_seconds, write_batch_size, flush_interval_seconds,
+                 eviction_interval_seconds=60):
+        super().__init__(ttl_seconds, eviction_interval_seconds)
+        # Сессии, к которым не обращались дольше idle_seconds, выгружаются из памяти, но остаются в базе
+        self.idle_seconds = idle_seconds
+        self.write_batch_size = write_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.dirty_user_ids = set()
+        self._last_flush = time.time()
+
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self.connection = sqlite3.connect(file_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (user_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self.connection.commit()
+
+    def save(self, user_id):
+        """Отметка об изменении сессии; запись в базу выполняется пачками"""
+        self.dirty_user_ids.add(user_id)
+
+        if (len(self.dirty_user_ids) >= self.write_batch_size
+                or time.time() - self._last_flush >= self.flush_interval_seconds):
+            self.flush()
+
+    def flush(self):
+        """Запись всех измененных сессий одной транзакцией"""
+        self._last_flush = time.time()
+        if not self.dirty_user_ids:
+            return
+
+        rows = [(user_id, json.dumps(self.sessions[user_id].to_dict(), ensure_ascii=False),
+                 self.sessions[user_id].last_seen)
+                for user_id in self.dirty_user_ids if user_id in self.sessions]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sessions (user_id, data, last_seen) VALUES (?, ?, ?)", rows
+            )
+        self.dirty_user_ids.clear()
+
+    def user_ids(self):
+        """Идентификаторы всех пользователей, сессии которых есть в памяти или в базе"""
+        self.flush()
+        rows = self.connection.execute("SELECT user_id FROM sessions").fetchall()
+        return list({row[0] for row in rows} | set(self.sessions))
+
+    def pop(self, user_id):
+        """Удаление сессии пользователя из памяти и из базы; None, если ее нет"""
+        session = self.sessions.pop(user_id, None)
+        if session is None:
+            row = self.connection.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None:
+                session = UserSession.from_dict(json.loads(row[0]))
+        self.dirty_user_ids.discard(user_id)
+        with self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        return session
+
+    def close(self):
+        """Запись оставшихся изменений и закрытие соединения с базой"""
+        self.flush()
+        self.connection.close()
+
+    def _load(self, user_id):
+        """Загрузка сессии из базы"""
+        row = self.connection.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return UserSession()
+        return UserSession.from_dict(json.loads(row[0]))
+
+    def _evict(self, now):
+        """Выгрузка из памяти неактивных сессий и удаление из базы сессий, время хранения которых истекло"""
+        self.unload_idle(now - self.idle_seconds)
+        self.evict_idle(now - self.ttl_seconds)
+
+    def unload_idle(self, threshold):
+        """Выгрузка из памяти сессий, к которым не обращались с момента threshold"""
+        self.flush()
+        idle_sessions = [(session.last_seen, user_id) for user_id, session in self.sessions.items()
+                         if session.last_seen < threshold]
+        # Чтение сессии не отмечает ее измененной, поэтому время последнего обращения записывается при выгрузке
+        with self.connection:
+            self.connection.executemany("UPDATE sessions SET last_seen = ? WHERE user_id = ?", idle_sessions)
+        for _, user_id in idle_sessions:
+            del self.sessions[user_id]
+
+    def evict_idle(self, threshold):
+        """Удаление неактивных сессий из памяти и из базы"""
+        self.flush()
+        super().evict_idle(threshold)
+        with self.connection:
+            expired_user_ids = [row[0] for row in self.connection.execute(
+                "SELECT user_id FROM sessions WHERE last_seen < ?", (threshold,)
+            )]
+            self.connection.execute("DELETE FROM sessions WHERE last_seen < ?", (threshold,))
+        # Сессии, которые еще в памяти, только читались с момента последней записи и сохраняются заново
+        self.dirty_user_ids.update(user_id for user_id in expired_user_ids if user_id in self.sessions)
+
+
+def create_session_store(backend, file_path, ttl_seconds, idle_seconds, write_batch_size, flush_interval_seconds):
+    """Создание хранилища сессий пользователей"""
+    if backend == "memory":
+        return MemorySessionStore(ttl_seconds)
+    elif backend == "sqlite":
+        return SqliteSessionStore(file_path, ttl_seconds, idle_seconds, write_batch_size, flush_interval_seconds)
+    raise ValueError(f"Неизвестный тип хранилища сессий: {backend}")
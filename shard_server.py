@@ -0,0 +1,148 @@
+import argparse
+import os
+import threading
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+from bot_logic import RestaurantAssistantBot, analyze_message, warm_up
+from menu_watcher import MenuWatcher
+from session_store import UserSession
+from sharding import ConsistentHashRing, AUTHKEY_ENV_VARIABLE, get_shard_name
+
+from config import MENU_WATCH_ENABLED, MENU_WATCH_INTERVAL_SECONDS, SESSION_FLUSH_INTERVAL_SECONDS
+
+
+class ShardServer:
+    def __init__(self, shard_id, session_store_backend, session_db_file_path):
+        self.shard_name = get_shard_name(shard_id)
+        self.bot = RestaurantAssistantBot(session_store_backend, session_db_file_path)
+        # Классификатор при изменении набора блюд переобучает только первый шард, остальные берут модель из файла
+        self.menu_watcher = MenuWatcher(MENU_WATCH_INTERVAL_SECONDS, retrain=shard_id == 0,
+                                        on_reload=self.bot.refresh_menu_views)
+        # Шард обрабатывает запросы по одному, поэтому состояние пользователя не меняется параллельно
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sessions_closed = False
+        self.commands = {
+            "ping": lambda: self.shard_name,
+            "process_message": self.process_message,
+            "show_menu": self.bot.show_menu,
+            "show_cart": self.bot.show_cart,
+            "clear_cart": self.bot.clear_cart,
+            "complete_order": self.bot.complete_order,
+            "get_followup_messages": self.bot.get_followup_messages,
+            "get_user_state": self.get_user_state,
+            "user_ids": self.bot.sessions.user_ids,
+            "export_moved": self.export_moved,
+            "import_sessions": self.import_sessions,
+            "shutdown": self.shutdown
+        }
+
+    def process_message(self, user_id, text):
+        """Ответ на сообщение пользователя вместе с распознанным намерением"""
+        analysis = analyze_message(text)
+        response = self.bot.handle_analysis(analysis, user_id)
+        return {"response": response, "intent": analysis["intent"], "confidence": float(analysis["confidence"])}
+
+    def get_user_state(self, user_id):
+        """Сессия пользователя в виде словаря (None, если ее нет в шарде)"""
+        if user_id not in self.bot.sessions.user_ids():
+            return None
+        return self.bot.sessions.get(user_id).to_dict()
+
+    def export_moved(self, shard_count):
+        """Удаление из шарда и возврат сессий пользователей, которые по новому кольцу принадлежат другим шардам"""
+        ring = ConsistentHashRing.for_count(shard_count)
+        moved_sessions = {}
+        for user_id in self.bot.sessions.user_ids():
+            if ring.get_shard(user_id) != self.shard_name:
+                session = self.bot.sessions.pop(user_id)
+                if session is not None:
+                    moved_sessions[user_id] = session.to_dict()
+        return moved_sessions
+
+    def import_sessions(self, sessions):
+        """Добавление сессий пользователей, перенесенных из других шардов"""
+        for user_id, session_data in sessions.items():
+            self.bot.sessions.put(user_id, UserSession.from_dict(session_data))
+        self.bot.sessions.flush()
+        return len(sessions)
+
+    def shutdown(self):
+        """Запись сессий перед остановкой шарда (процесс завершается после отправки ответа)"""
+        self.bot.sessions.close()
+        self._sessions_closed = True
+        return True
+
+    def _maintain_sessions_loop(self):
+        """Периодическая запись накопленных изменений сессий и выгрузка неактивных сессий из памяти"""
+        while not self._stopped.wait(SESSION_FLUSH_INTERVAL_SECONDS):
+            with self._lock:
+                if self._sessions_closed:
+                    return
+                self.bot.sessions.maintain()
+
+    def handle_connection(self, connection):
+        """Обработка запросов одного соединения до его закрытия"""
+        with connection:
+            while not self._stopped.is_set():
+                try:
+                    command, args = connection.recv()
+                except EOFError:
+                    return
+                with self._lock:
+                    try:
+                        reply = ("ok", self.commands[command](*args))
+                    except Exception as error:
+                        traceback.print_exc()
+                        reply = ("error", f"{type(error).__name__}: {error}")
+                connection.send(reply)
+                if command == "shutdown":
+                    self._stopped.set()
+
+    def serve(self, host, port, authkey):
+        """Прием соединений до команды остановки; каждое соединение обслуживается в отдельном потоке"""
+        warm_up()
+        self.bot.refresh_menu_views()
+        if MENU_WATCH_ENABLED:
+            self.menu_watcher.start()
+
+        listener = Listener((host, port), authkey=authkey)
+        threading.Thread(target=self._accept_loop, args=(listener,), name="shard-listener", daemon=True).start()
+        threading.Thread(target=self._maintain_sessions_loop, name="shard-sessions", daemon=True).start()
+        print(f"{self.shard_name} принимает запросы на {host}:{port}")
+
+        # Основной поток ждет команды остановки, потоки соединений завершаются вместе с процессом
+        self._stopped.wait()
+        listener.close()
+
+    def _accept_loop(self, listener):
+        """Прием новых соединений"""
+        while not self._stopped.is_set():
+            try:
+                connection = listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self.handle_connection, args=(connection,), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Процесс шарда бота, владеющий состоянием части пользователей")
+    parser.add_argument("--shard-id", type=int, required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--session-backend", default="sqlite")
+    parser.add_argument("--session-db", required=True)
+    args = parser.parse_args()
+
+    authkey = bytes.fromhex(os.environ[AUTHKEY_ENV_VARIABLE])
+
+    server = ShardServer(args.shard_id, args.session_backend, args.session_db)
+    server.serve(args.host, args.port, authkey)
+
+
+if __name__ == '__main__':
+    main()
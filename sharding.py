@@ -0,0 +1,265 @@
+import asyncio
+import bisect
+import glob
+import hashlib
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client
+
+# Переменная окружения, через которую шардам передается ключ аутентификации соединений
+AUTHKEY_ENV_VARIABLE = "BOT_SHARD_AUTHKEY"
+
+
+def get_shard_name(index):
+    """Имя шарда по его номеру"""
+    return f"shard-{index}"
+
+
+def get_shard_db_file_path(db_file_path, index):
+    """Файл базы сессий шарда: models/sessions.sqlite3 -> models/sessions.shard0.sqlite3"""
+    root, extension = os.path.splitext(db_file_path)
+    return f"{root}.shard{index}{extension}"
+
+
+def _hash(key):
+    """Позиция ключа на кольце"""
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    def __init__(self, shard_names, replicas=100):
+        self.shard_names = list(shard_names)
+        self.replicas = replicas
+        # Каждый шард представлен на кольце несколькими точками для равномерного распределения пользователей
+        points = sorted((_hash(f"{shard_name}#{replica}"), shard_name)
+                        for shard_name in self.shard_names for replica in range(replicas))
+        self._positions = [position for position, _ in points]
+        self._owners = [shard_name for _, shard_name in points]
+
+    @classmethod
+    def for_count(cls, shard_count, replicas=100):
+        """Кольцо из shard_count шардов с именами shard-0, shard-1, ..."""
+        return cls([get_shard_name(index) for index in range(shard_count)], replicas)
+
+    def get_shard(self, user_id):
+        """Шард, владеющий состоянием пользователя"""
+        index = bisect.bisect(self._positions, _hash(str(user_id)))
+        return self._owners[index % len(self._owners)]
+
+
+class ShardError(Exception):
+    """Ошибка обработки запроса в шарде"""
+
+
+class ShardRouter:
+    def __init__(self, shard_count, host, base_port, session_store_backend, session_db_file_path,
+                 connect_timeout_seconds=300):
+        self.shard_count = shard_count
+        self.host = host
+        self.base_port = base_port
+        self.session_store_backend = session_store_backend
+        self.session_db_file_path = session_db_file_path
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.ring = ConsistentHashRing.for_count(shard_count)
+        self.authkey = secrets.token_bytes(32)
+        self.processes = {}
+        self.connections = {}
+        self.locks = {}
+        # У каждого шарда свой поток для блокирующих запросов: шард обрабатывает запросы по одному, а общий пул
+        # заполнялся бы потоками, ожидающими занятый шард, и задерживал бы остальные задачи run_in_executor
+        self.executors = {}
+        self._reshard_lock = threading.Lock()
+
+    def _get_address(self, index):
+        """Адрес, на котором шард принимает соединения"""
+        return self.host, self.base_port + index
+
+    def _launch(self, index):
+        """Запуск процесса шарда"""
+        shard_name = get_shard_name(index)
+        environment = dict(os.environ, **{AUTHKEY_ENV_VARIABLE: self.authkey.hex()})
+        self.processes[shard_name] = subprocess.Popen(
+            [sys.executable, "shard_server.py", "--shard-id", str(index), "--host", self.host,
+             "--port", str(self.base_port + index), "--session-backend", self.session_store_backend,
+             "--session-db", get_shard_db_file_path(self.session_db_file_path, index)],
+            env=environment
+        )
+
+    def _connect(self, index):
+        """Подключение к запущенному шарду (ожидание, пока он загрузит модели и начнет принимать соединения)"""
+        shard_name = get_shard_name(index)
+        deadline = time.monotonic() + self.connect_timeout_seconds
+        while True:
+            try:
+                connection = Client(self._get_address(index), authkey=self.authkey)
+                break
+            except ConnectionRefusedError:
+                if self.processes[shard_name].poll() is not None:
+                    raise ShardError(f"Процесс {shard_name} завершился при запуске")
+                if time.monotonic() > deadline:
+                    raise ShardError(f"Не удалось подключиться к {shard_name}")
+                time.sleep(0.2)
+        self.connections[shard_name] = connection
+        self.locks[shard_name] = threading.Lock()
+        # Поток остановленного шарда сохраняется до завершения работы: запрос, выбравший шард по старому кольцу,
+        # еще может быть в него передан и будет перенаправлен в call_routed
+        if shard_name not in self.executors:
+            self.executors[shard_name] = ThreadPoolExecutor(1, thread_name_prefix=shard_name)
+
+    def _start_shards(self, indexes):
+        """Запуск нескольких шардов параллельно и подключение к ним"""
+        for index in indexes:
+            self._launch(index)
+        for index in indexes:
+            self._connect(index)
+
+    def _stop_shard(self, shard_name):
+        """Остановка шарда с записью его сессий"""
+        with self.locks[shard_name]:
+            self._request(shard_name, "shutdown")
+            self.connections.pop(shard_name).close()
+        self.locks.pop(shard_name)
+        self.processes.pop(shard_name).wait()
+
+    def _request(self, shard_name, command, *args):
+        """Отправка запроса шарду без блокировки (вызывающий код уже владеет соединением)"""
+        connection = self.connections[shard_name]
+        connection.send((command, args))
+        status, result = connection.recv()
+        if status == "error":
+            raise ShardError(f"{shard_name}: {result}")
+        return result
+
+    def call(self, shard_name, command, *args):
+        """Синхронный запрос к шарду"""
+        with self.locks[shard_name]:
+            return self._request(shard_name, command, *args)
+
+    def call_routed(self, key, command, *args):
+        """Синхронный запрос к шарду, выбранному по ключу (с повтором, если во время ожидания изменилось кольцо)"""
+        while True:
+            ring = self.ring
+            shard_name = ring.get_shard(key)
+            lock = self.locks.get(shard_name)
+            if lock is None:
+                # Кольцо и соединения расходятся только во время изменения количества шардов: ожидание его завершения
+                with self._reshard_lock:
+                    if self.ring is ring and shard_name not in self.locks:
+                        raise ShardError(f"Нет соединения с {shard_name}")
+                continue
+            with lock:
+                if self.ring is ring and shard_name in self.connections:
+                    return self._request(shard_name, command, *args)
+
+    def call_for_user(self, user_id, command, *args):
+        """Синхронный запрос к шарду, владеющему состоянием пользователя"""
+        return self.call_routed(user_id, command, user_id, *args)
+
+    def start(self):
+        """Запуск шардов с переносом сессий, если предыдущий запуск был с другим количеством шардов"""
+        previous_count = 0
+        if self.session_store_backend == "sqlite":
+            pattern = get_shard_db_file_path(self.session_db_file_path, "*")
+            previous_count = len(glob.glob(pattern))
+
+        # Шарды прошлого запуска поднимаются, чтобы отдать сессии пользователей, которые теперь принадлежат другим
+        self._start_shards(range(max(self.shard_count, previous_count)))
+        if previous_count and previous_count != self.shard_count:
+            self._migrate(self.shard_count)
+            self._stop_extra_shards(self.shard_count)
+
+    def reshard(self, shard_count):
+        """Изменение количества шардов с переносом сессий пользователей, сменивших шард"""
+        with self._reshard_lock:
+            if shard_count == self.shard_count:
+                return 0
+            if shard_count > self.shard_count:
+                self._start_shards(range(self.shard_count, shard_count))
+
+            # Запросы ко всем шардам приостанавливаются на время переноса
+            shard_names = sorted(self.locks)
+            for shard_name in shard_names:
+                self.locks[shard_name].acquire()
+            try:
+                moved_count = self._migrate(shard_count)
+                self.ring = ConsistentHashRing.for_count(shard_count)
+            finally:
+                for shard_name in shard_names:
+                    self.locks[shard_name].release()
+
+            self._stop_extra_shards(shard_count)
+            self.shard_count = shard_count
+            return moved_count
+
+    def _migrate(self, shard_count):
+        """Перенос сессий между шардами по новому кольцу (соединения уже должны быть захвачены или не использоваться)"""
+        moved_sessions = {}
+        for shard_name in list(self.connections):
+            for user_id, session_data in self._request(shard_name, "export_moved", shard_count).items():
+                moved_sessions[user_id] = session_data
+
+        ring = ConsistentHashRing.for_count(shard_count)
+        sessions_by_shard = {}
+        for user_id, session_data in moved_sessions.items():
+            sessions_by_shard.setdefault(ring.get_shard(user_id), {})[user_id] = session_data
+        for shard_name, sessions in sessions_by_shard.items():
+            self._request(shard_name, "import_sessions", sessions)
+
+        return len(moved_sessions)
+
+    def _stop_extra_shards(self, shard_count):
+        """Остановка шардов, не входящих в кольцо, и удаление их пустых баз сессий"""
+        for shard_name in list(self.connections):
+            index = int(shard_name.rsplit("-", 1)[1])
+            if index >= shard_count:
+                self._stop_shard(shard_name)
+                if self.session_store_backend == "sqlite":
+                    db_file_path = get_shard_db_file_path(self.session_db_file_path, index)
+                    for file_path in (db_file_path, f"{db_file_path}-wal", f"{db_file_path}-shm"):
+                        if os.path.exists(file_path):
+                            os.remove(file_path)
+
+    def shutdown(self):
+        """Остановка всех шардов"""
+        for shard_name in list(self.connections):
+            self._stop_shard(shard_name)
+        for executor in self.executors.values():
+            executor.shutdown()
+        self.executors.clear()
+
+    async def _call_async(self, key, function, *args):
+        """Выполнение блокирующего запроса в потоке шарда, выбранного по ключу, вне цикла событий"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executors[self.ring.get_shard(key)], function, *args)
+
+    async def process_message(self, text, user_id):
+        """Ответ на сообщение пользователя вместе с распознанным намерением"""
+        return await self._call_async(user_id, self.call_for_user, user_id, "process_message", text)
+
+    async def show_menu(self, page=1):
+        """Текст страницы меню (меню одинаково во всех шардах)"""
+        return await self._call_async(str(page), self.call_routed, str(page), "show_menu", page)
+
+    async def show_cart(self, user_id):
+        """Текст содержимого корзины"""
+        return await self._call_async(user_id, self.call_for_user, user_id, "show_cart")
+
+    async def clear_cart(self, user_id):
+        """Очистка корзины"""
+        return await self._call_async(user_id, self.call_for_user, user_id, "clear_cart")
+
+    async def complete_order(self, user_id):
+        """Оформление заказа"""
+        return await self._call_async(user_id, self.call_for_user, user_id, "complete_order")
+
+    async def get_followup_messages(self, user_id):
+        """Дополнительные сообщения после ответа (извинение или купон)"""
+        return await self._call_async(user_id, self.call_for_user, user_id, "get_followup_messages")
+
+    async def maintain_sessions(self):
+        """Сессии хранятся в шардах, которые обслуживают их сами"""
@@ -0,0 +1,90 @@
+import json
+from collections import Counter
+
+from fuzzy_matching import bounded_edit_distance, get_max_distance
+
+# Максимальная доля ошибок в слове, которую исправляет корректор (две ошибки - только в словах от 8 букв)
+MAX_ERROR_RATIO = 1 / 4
+
+
+def get_domain_vocabulary(menu_file_path, intent_dataset_file_path, dialogues_file_path, cleaner):
+    """Частотный словарь предметной области: названия и описания блюд, примеры намерений и диалоги"""
+    vocabulary = Counter()
+
+    with open(menu_file_path, "r", encoding="utf-8") as file:
+        menu = json.load(file)
+    for dish_id, dish_data in menu.items():
+        texts = [dish_id, dish_data.get("name", ""), dish_data.get("description", "")]
+        for text in texts:
+            vocabulary.update(cleaner(text).split())
+
+    with open(intent_dataset_file_path, "r", encoding="utf-8") as file:
+        intent_dataset = json.load(file)
+    for intent_data in intent_dataset["intents"].values():
+        for example in intent_data["examples"]:
+            vocabulary.update(cleaner(example.replace("<DISH>", " ")).split())
+
+    with open(dialogues_file_path, "r", encoding="utf8") as file:
+        for line in file:
+            if line.startswith("- "):
+                vocabulary.update(cleaner(line[2:]).split())
+
+    return vocabulary
+
+
+class SymSpellCorrector:
+    def __init__(self, vocabulary, max_distance=2):
+        self.vocabulary = dict(vocabulary)
+        self.max_distance = max_distance
+        # Индекс удалений: строка, полученная удалением до max_distance символов -> слова словаря
+        self.deletes = {}
+
+        for word in self.vocabulary:
+            for variant in self._get_deletes(word, max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+
+    @staticmethod
+    def _get_deletes(word, max_distance):
+        """Все строки, получаемые из слова удалением не более max_distance символов (включая само слово)"""
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for variant in frontier:
+                if len(variant) <= 1:
+                    continue
+                for i in range(len(variant)):
+                    next_frontier.add(variant[:i] + variant[i + 1:])
+            next_frontier -= variants
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def __contains__(self, word):
+        return word in self.vocabulary
+
+    def correction(self, word):
+        """Ближайшее слово словаря (при равном расстоянии - самое частое) или None, если такого нет"""
+        if word in self.vocabulary:
+            return word
+
+        max_distance = min(self.max_distance, get_max_distance(len(word), MAX_ERROR_RATIO))
+        if max_distance <= 0:
+            return None
+
+        best_word = None
+        best_key = None
+        checked = set()
+        for variant in self._get_deletes(word, max_distance):
+            for candidate in self.deletes.get(variant, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                distance = bounded_edit_distance(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                key = (distance, -self.vocabulary[candidate], candidate)
+                if best_key is None or key < best_key:
+                    best_word, best_key = candidate, key
+
+        return best_word
@@ -0,0 +1,2 @@
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: тесты, запускающие процессы бота (пропуск: -m \"not slow\")")
@@ -0,0 +1,101 @@
+import random
+
+import nltk
+import pytest
+
+from fuzzy_matching import (BATCH_MIN_CANDIDATES, bounded_edit_distance, batch_edit_distance, find_nearest,
+                            has_close_match)
+
+SEED = 42
+# Небольшой алфавит, чтобы среди случайных строк часто встречались близкие
+ALPHABET = "абвгд "
+
+
+def random_text(rng, min_length=0, max_length=10):
+    """Случайная строка из небольшого алфавита"""
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_length, max_length)))
+
+
+def make_cases(seed, count, candidates_count, min_length=1, max_length=10):
+    """Пары (запрос, непустые кандидаты) с фиксированным зерном"""
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        candidates = [random_text(rng, min_length, max_length) for _ in range(candidates_count)]
+        # Часть запросов получается небольшим изменением одного из кандидатов
+        if rng.random() < 0.5:
+            query = rng.choice(candidates)[:-1] + random_text(rng, 0, 1)
+        else:
+            query = random_text(rng, min_length, max_length)
+        cases.append((query, candidates))
+    return cases
+
+
+def reference_has_close_match(text, candidates, ratio):
+    """Проверка близкого кандидата через nltk.edit_distance"""
+    return any(candidate and nltk.edit_distance(text, candidate) / len(candidate) <= ratio
+               for candidate in candidates)
+
+
+def reference_find_nearest(text, candidates, ratio):
+    """Поиск ближайшего кандидата через nltk.edit_distance (при равных расстояниях - встретившегося раньше)"""
+    best = None
+    for index, candidate in enumerate(candidates):
+        if candidate and abs(len(text) - len(candidate)) / len(candidate) < ratio:
+            weighted_distance = nltk.edit_distance(text, candidate) / len(candidate)
+            if weighted_distance < ratio and (best is None or weighted_distance < best[1]):
+                best = (index, weighted_distance)
+    return best
+
+
+@pytest.mark.parametrize("max_distance", [-1, 0, 1, 2, 4])
+def test_bounded_edit_distance(max_distance):
+    rng = random.Random(SEED)
+    for _ in range(500):
+        first, second = random_text(rng), random_text(rng)
+        distance = nltk.edit_distance(first, second)
+        expected = distance if distance <= max_distance else max_distance + 1
+        if max_distance < 0:
+            expected = 0 if first == second else max_distance + 1
+        assert bounded_edit_distance(first, second, max_distance) == expected, (first, second)
+
+
+def test_batch_edit_distance():
+    for query, candidates in make_cases(SEED, 200, 10):
+        candidates = candidates + [""]
+        expected = [nltk.edit_distance(query, candidate) for candidate in candidates]
+        assert batch_edit_distance(query, candidates).tolist() == expected, query
+
+
+def test_batch_edit_distance_empty():
+    assert batch_edit_distance("борщ", []).tolist() == []
+
+
+# Векторизованный расчет используется, если после отсечения по длине остается не меньше BATCH_MIN_CANDIDATES
+# кандидатов, поэтому для него кандидаты берутся многочисленными и близкими по длине
+@pytest.mark.parametrize("candidates_count, min_length, max_length", [
+    (5, 1, 10),
+    (BATCH_MIN_CANDIDATES * 2, 9, 10)
+], ids=["bounded", "batch"])
+@pytest.mark.parametrize("ratio", [0.2, 0.34, 0.5])
+def test_find_nearest(candidates_count, min_length, max_length, ratio):
+    for query, candidates in make_cases(SEED, 200, candidates_count, min_length, max_length):
+        expected = reference_find_nearest(query, candidates, ratio)
+        nearest = find_nearest(query, candidates, ratio)
+        if expected is None:
+            assert nearest is None, query
+        else:
+            assert nearest[0] == expected[0], query
+            assert nearest[1] == pytest.approx(expected[1])
+
+
+def test_find_nearest_skips_empty_candidates():
+    assert find_nearest("", ["", "а"], 0.5) is None
+    assert find_nearest("б", ["", "а", "б"], 0.5) == (2, 0.0)
+
+
+@pytest.mark.parametrize("ratio", [0.0, 0.25, 1 / 3, 0.5])
+def test_has_close_match(ratio):
+    for query, candidates in make_cases(SEED, 300, 8):
+        candidates = candidates + [""]
+        assert has_close_match(query, candidates, ratio) == reference_has_close_match(query, candidates, ratio), query
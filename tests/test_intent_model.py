@@ -0,0 +1,51 @@
+import pytest
+
+from intent_classifier import IntentClassifier, CompactIntentClassifier, prepare_intents_dataset_for_model
+
+from config import INTENT_DATASET_FILE_PATH
+
+# Допустимое расхождение значений решающей функции (float32 в sklearn против float64 в компактной модели)
+CONFIDENCE_TOLERANCE = 1e-5
+
+EXTRA_TEXTS = ["", "   ", "qqqq zzzz", "Хочу  БОРЩ\tи пиццу", "а"]
+
+
+@pytest.fixture(scope="module")
+def texts():
+    X, _, _ = prepare_intents_dataset_for_model(INTENT_DATASET_FILE_PATH)
+    return X + EXTRA_TEXTS
+
+
+@pytest.fixture(scope="module", params=["multiclass", "binary"])
+def classifiers(request, tmp_path_factory):
+    X, y, _ = prepare_intents_dataset_for_model(INTENT_DATASET_FILE_PATH)
+    if request.param == "binary":
+        y = [intent == y[0] for intent in y]
+    classifier = IntentClassifier()
+    classifier.train(X, y)
+
+    dir_path = tmp_path_factory.mktemp("compact_model")
+    classifier.export_compact(str(dir_path))
+    return classifier, CompactIntentClassifier.load(str(dir_path))
+
+
+def test_compact_model_matches_pipeline(classifiers, texts):
+    classifier, compact_classifier = classifiers
+    labels, confidences = classifier.predict_batch(texts)
+    compact_labels, compact_confidences = compact_classifier.predict_batch(texts)
+
+    assert compact_labels == [str(label) for label in labels]
+    assert compact_confidences == pytest.approx(confidences, abs=CONFIDENCE_TOLERANCE)
+
+
+def test_compact_model_batch_matches_single_predictions(classifiers, texts):
+    _, compact_classifier = classifiers
+    labels, _ = compact_classifier.predict_batch(texts)
+
+    assert labels == [compact_classifier.predict(text) for text in texts]
+
+
+def test_compact_model_empty_batch(classifiers):
+    _, compact_classifier = classifiers
+
+    assert compact_classifier.predict_batch([]) == ([], [])
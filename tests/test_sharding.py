@@ -0,0 +1,53 @@
+import pytest
+
+from benchmarks.bench_sharding import make_scripts, run_router, collect_states, compare_states
+from sharding import ShardRouter
+
+from config import SHARD_HOST, SHARD_BASE_PORT
+
+# Каждый тест запускает процессы шардов, которые загружают модели бота
+pytestmark = pytest.mark.slow
+
+USERS = 30
+MESSAGES = 5
+SHARDS = 2
+# Порты смещены относительно бенчмарка, а у каждого теста свой диапазон на случай незакрытых сокетов
+PORT_OFFSET = 50
+
+
+@pytest.fixture(scope="module")
+def scripts():
+    return make_scripts(USERS, MESSAGES)
+
+
+@pytest.fixture(scope="module")
+def reference_states(scripts, tmp_path_factory):
+    db_file_path = tmp_path_factory.mktemp("reference") / "sessions.sqlite3"
+    _, states = run_router(1, str(db_file_path), scripts, port_offset=PORT_OFFSET)
+    return states
+
+
+def test_sharded_states_match_single_shard(scripts, reference_states, tmp_path):
+    _, states = run_router(SHARDS, str(tmp_path / "sessions.sqlite3"), scripts, port_offset=PORT_OFFSET + 5)
+
+    compare_states(states, reference_states)
+
+
+def test_reshard_under_load_keeps_each_user_in_one_shard(scripts, reference_states, tmp_path):
+    reshard_plan = [(0.2, SHARDS + 1), (0.2, SHARDS - 1)]
+    _, states = run_router(SHARDS, str(tmp_path / "sessions.sqlite3"), scripts, reshard_plan,
+                           port_offset=PORT_OFFSET + 10)
+
+    compare_states(states, reference_states)
+
+
+def test_restart_with_other_shard_count_migrates_sessions(scripts, reference_states, tmp_path):
+    db_file_path = str(tmp_path / "sessions.sqlite3")
+    run_router(SHARDS, db_file_path, scripts, port_offset=PORT_OFFSET + 15)
+
+    router = ShardRouter(SHARDS + 1, SHARD_HOST, SHARD_BASE_PORT + PORT_OFFSET + 20, "sqlite", db_file_path)
+    router.start()
+    try:
+        compare_states(collect_states(router), reference_states)
+    finally:
+        router.shutdown()
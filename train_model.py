@@ -0,0 +1,31 @@
+import argparse
+
+import matplotlib
+
+# Графики только сохраняются в файлы, поэтому окно для них не требуется
+matplotlib.use("Agg")
+
+from intent_classifier import train_and_save_model
+
+from config import INTENT_DATASET_FILE_PATH, MODEL_FILE_PATH, TRAINING_RANDOM_SEED, TRAINING_REPORT_DIR_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение классификатора намерений с сохранением метрик и графиков")
+    parser.add_argument("--dataset", default=INTENT_DATASET_FILE_PATH)
+    parser.add_argument("--model", default=MODEL_FILE_PATH)
+    parser.add_argument("--report-dir", default=TRAINING_REPORT_DIR_PATH)
+    parser.add_argument("--seed", type=int, default=TRAINING_RANDOM_SEED)
+    parser.add_argument("--cv-folds", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="количество процессов (-1 - все ядра)")
+    parser.add_argument("--search", action="store_true", help="подбор диапазона n-грамм и параметра C")
+    parser.add_argument("--learning-curve", action="store_true", help="построение кривой обучения")
+    args = parser.parse_args()
+
+    train_and_save_model(args.dataset, args.model, seed=args.seed, report_dir_path=args.report_dir,
+                         cv_folds=args.cv_folds, n_jobs=args.n_jobs, search=args.search,
+                         with_learning_curve=args.learning_curve)
+
+
+if __name__ == '__main__':
+    main()
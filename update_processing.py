@@ -0,0 +1,49 @@
+import asyncio
+from weakref import WeakValueDictionary
+
+from telegram.ext import BaseUpdateProcessor
+
+
+def get_update_owner(update):
+    """Пользователь (или чат), обновления которого должны обрабатываться по очереди"""
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return f"user:{user.id}"
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return f"chat:{chat.id}"
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates, max_pending_updates):
+        # Ограничение базового класса - количество принятых в обработку обновлений, включая ожидающие своей очереди
+        super().__init__(max(max_pending_updates, max_concurrent_updates, 2))
+        # Количество одновременно выполняемых обработчиков
+        self.max_running_updates = max_concurrent_updates
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._owner_locks = WeakValueDictionary()
+
+    async def do_process_update(self, update, coroutine):
+        """Обработка обновления после завершения предыдущих обновлений того же пользователя"""
+        owner = get_update_owner(update)
+        if owner is None:
+            async with self._running:
+                await coroutine
+            return
+
+        lock = self._owner_locks.get(owner)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._owner_locks[owner] = lock
+
+        # Ожидание очереди пользователя не занимает места среди выполняемых обработчиков
+        async with lock:
+            async with self._running:
+                await coroutine
+
+    async def initialize(self):
+        """Ресурсы не требуются"""
+
+    async def shutdown(self):
+        """Ресурсы не требуются"""
@@ -0,0 +1,108 @@
+import asyncio
+import hmac
+import json
+from http import HTTPStatus
+
+from telegram import Update
+
+# Заголовок, в котором Telegram передает секрет, указанный при регистрации вебхука
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class WebhookServer:
+    def __init__(self, application, host, port, url_path, secret_token=None, max_body_size=1024 * 1024):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.url_path = "/" + url_path.strip("/")
+        self.secret_token = secret_token
+        self.max_body_size = max_body_size
+        self.received = 0
+        self._server = None
+
+    async def start(self):
+        """Запуск HTTP-сервера в цикле событий приложения"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # При порте 0 система выбирает свободный порт
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Остановка приема новых соединений"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        """Обработка запросов одного соединения (Telegram держит соединения открытыми между обновлениями)"""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status = await self._handle_request(method, path, headers, body)
+                # Непрочитанное слишком большое тело не позволяет продолжить чтение запросов из соединения
+                keep_alive = body is not None and headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Чтение строки запроса, заголовков и тела (None, если клиент закрыл соединение)"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        content_length = int(headers.get("content-length", 0))
+        if content_length > self.max_body_size:
+            return method, path, headers, None
+        body = await reader.readexactly(content_length)
+        return method, path, headers, body
+
+    async def _handle_request(self, method, path, headers, body):
+        """Проверка запроса и передача обновления приложению"""
+        if path.split("?", 1)[0] != self.url_path:
+            return HTTPStatus.NOT_FOUND
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED
+        if self.secret_token is not None and not hmac.compare_digest(
+                headers.get(SECRET_TOKEN_HEADER, "").encode("latin-1"), self.secret_token.encode("utf-8")):
+            return HTTPStatus.FORBIDDEN
+        if body is None:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+        try:
+            data = json.loads(body)
+            update = Update.de_json(data, self.application.bot) if isinstance(data, dict) else None
+        except (ValueError, TypeError, KeyError):
+            update = None
+        if update is None:
+            return HTTPStatus.BAD_REQUEST
+
+        # Обновления ставятся в очередь в порядке поступления, обработчики запускаются приложением
+        await self.application.update_queue.put(update)
+        self.received += 1
+        return HTTPStatus.OK
+
+    def _write_response(self, writer, status, keep_alive):
+        """Ответ без тела: Telegram учитывает только код ответа"""
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+        )
@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from bot_logic import analyze_message, prepare_message, warm_up
+from menu_watcher import MenuWatcher
+
+from config import MENU_WATCH_ENABLED, MENU_WATCH_INTERVAL_SECONDS
+
+
+class WorkerPoolOverloadedError(Exception):
+    """Очередь пула заполнена, а политика переполнения требует отклонить запрос"""
+
+
+def _init_worker():
+    """Загрузка моделей в рабочем процессе один раз при его запуске"""
+    warm_up()
+    # Рабочий процесс перестраивает свои данные при изменении меню сам, а новую модель берет из файла
+    if MENU_WATCH_ENABLED:
+        MenuWatcher(MENU_WATCH_INTERVAL_SECONDS, retrain=False).start()
+
+
+class MessageWorkerPool:
+    def __init__(self, mode, workers, queue_size, overflow_policy="wait"):
+        if mode == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        elif mode == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        elif mode is None:
+            self.executor = None
+        else:
+            raise ValueError(f"Неизвестный режим выполнения анализа сообщений: {mode}")
+
+        if overflow_policy not in ("wait", "reject"):
+            raise ValueError(f"Неизвестная политика переполнения очереди: {overflow_policy}")
+
+        self.mode = mode
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.capacity = workers + queue_size
+        self.pending = 0
+        self._slots = asyncio.Semaphore(self.capacity)
+
+    @property
+    def queue_depth(self):
+        """Количество запросов, ожидающих свободного исполнителя"""
+        return max(self.pending - self.workers, 0)
+
+    async def analyze(self, text, prepared_text=None, prediction=None):
+        """Анализ сообщения в пуле: текст -> нормализованный текст, сущности, тональность, намерение и ответ"""
+        return await self.run(analyze_message, text, prepared_text, prediction)
+
+    async def prepare(self, text):
+        """Нормализация текста сообщения в пуле"""
+        return await self.run(prepare_message, text)
+
+    async def run(self, function, *args):
+        """Выполнение функции в пуле с учетом ограничения очереди"""
+        if self.executor is None:
+            return function(*args)
+
+        if self.overflow_policy == "reject" and self.pending >= self.capacity:
+            raise WorkerPoolOverloadedError(f"Очередь анализа сообщений заполнена ({self.capacity} запросов)")
+
+        self.pending += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    def start(self):
+        """Запуск всех исполнителей заранее, чтобы загрузка моделей не пришлась на первые сообщения"""
+        if self.executor is None:
+            return
+        futures = [self.executor.submit(warm_up) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        """Остановка пула"""
+        if self.executor is not None:
+            self.executor.shutdown()